@@ -2,124 +2,274 @@
 import os
 import time
 import re
-from typing import Any, Dict, List, Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson  # much faster decode for large task lists
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _loads = json.loads
 
 ASANA_PAT = os.getenv("ASANA_PAT", "").strip()
 ASANA_BASE = "https://app.asana.com/api/1.0"
 ASANA_CACHE_TTL = int(os.getenv("ASANA_CACHE_TTL", "300"))  # seconds
+ASANA_CACHE_MAX = int(os.getenv("ASANA_CACHE_MAX", "1024"))  # entries
 ASANA_PROJECT_IDS_ENV = os.getenv("ASANA_PROJECT_IDS", "").strip()
+ASANA_MAX_WORKERS = max(1, int(os.getenv("ASANA_MAX_WORKERS", "8")))  # concurrent calls
+
+# shared pool for fanning out independent, network-bound Asana calls
+_EXECUTOR = ThreadPoolExecutor(max_workers=ASANA_MAX_WORKERS)
+# stale-while-revalidate refreshes get their own pool: a refresh such as
+# "all_projects" fans out on _EXECUTOR and waits for it, which would deadlock
+# if it were itself occupying one of _EXECUTOR's workers (ASANA_MAX_WORKERS=1)
+_REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+
+# bounded LRU cache: { "workspaces": {...}, "tasks:<project_gid>": {...} }
+# entries are {"val": ..., "ts": time.monotonic()}
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_refreshing: set = set()
 
-# simple in-memory cache: { "projects": {...}, "tasks:<project_gid>": {...} }
-_cache: Dict[str, Dict[str, Any]] = {}
+# validators for conditional GETs: { "<path>?<params>": (etag, last_modified, payload) }
+# a 304 re-serves the stored payload instead of re-downloading it
+_validators: "OrderedDict[str, tuple]" = OrderedDict()
+
+# one pooled session so every Asana call reuses keep-alive connections;
+# every executor worker (plus the calling thread) can hold a socket to
+# app.asana.com without the pool discarding connections
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=max(32, ASANA_MAX_WORKERS + 1),
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504]),
+)
+_session.mount("https://", _adapter)
+if ASANA_PAT:
+    _session.headers["Authorization"] = f"Bearer {ASANA_PAT}"
 
 def asana_available() -> bool:
     return bool(ASANA_PAT)
 
-def _headers() -> Dict[str, str]:
+def _get(path: str, params: Optional[Dict[str, Any]] = None, conditional: bool = False) -> Dict[str, Any]:
     if not asana_available():
         raise RuntimeError("ASANA_PAT is not set")
-    return {"Authorization": f"Bearer {ASANA_PAT}"}
-
-def _get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     url = f"{ASANA_BASE}{path}"
-    r = requests.get(url, headers=_headers(), params=params, timeout=60)
+    vkey = headers = prev = None
+    if conditional:
+        vkey = path + "?" + "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        with _cache_lock:
+            prev = _validators.get(vkey)
+        if prev is not None:
+            etag, last_mod, _ = prev
+            headers = {}
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_mod:
+                headers["If-Modified-Since"] = last_mod
+    r = _session.get(url, params=params, headers=headers, timeout=60)
+    if r.status_code == 304 and prev is not None:
+        return prev[2]
     # If you hit 402 here, it would mean a premium-only endpoint.
     r.raise_for_status()
-    return r.json()
+    data = _loads(r.content)
+    if vkey is not None:
+        etag, last_mod = r.headers.get("ETag"), r.headers.get("Last-Modified")
+        if etag or last_mod:
+            with _cache_lock:
+                _validators[vkey] = (etag, last_mod, data)
+                _validators.move_to_end(vkey)
+                while len(_validators) > ASANA_CACHE_MAX:
+                    _validators.popitem(last=False)
+    return data
 
-def list_workspaces() -> List[Dict[str, Any]]:
-    data = _get("/workspaces")
+def _cache_put(key: str, val):
+    with _cache_lock:
+        _cache[key] = {"val": val, "ts": time.monotonic()}
+        _cache.move_to_end(key)
+        while len(_cache) > ASANA_CACHE_MAX:
+            _cache.popitem(last=False)
+
+def _cache_drop(key: str):
+    with _cache_lock:
+        _cache.pop(key, None)
+
+def _cache_drop_prefix(prefix: str):
+    with _cache_lock:
+        for key in [k for k in _cache if k.startswith(prefix)]:
+            del _cache[key]
+
+def _refresh(key: str, loader: Callable[[], Any]):
+    try:
+        _cache_put(key, loader())
+    except Exception:
+        # keep serving the stale value; the next read retries
+        pass
+    finally:
+        with _cache_lock:
+            _refreshing.discard(key)
+
+def _cached(key: str, loader: Callable[[], Any]):
+    """
+    Stale-while-revalidate: fresh entries are returned as-is, expired ones are
+    returned immediately while a background refresh runs. Only a cold miss
+    waits on the network.
+    """
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+            if (time.monotonic() - entry["ts"]) > ASANA_CACHE_TTL and key not in _refreshing:
+                _refreshing.add(key)
+                _REFRESH_EXECUTOR.submit(_refresh, key, loader)
+            return entry["val"]
+    val = loader()
+    _cache_put(key, val)
+    return val
+
+def _fetch_workspaces() -> List[Dict[str, Any]]:
+    data = _get("/workspaces", conditional=True)
     out = []
     for ws in data.get("data", []):
         out.append({"gid": ws.get("gid"), "name": ws.get("name")})
     return out
 
-def list_projects(workspace_gid: str) -> List[Dict[str, Any]]:
+def list_workspaces() -> List[Dict[str, Any]]:
+    return _cached("workspaces", _fetch_workspaces)
+
+def _fetch_projects(workspace_gid: str) -> List[Dict[str, Any]]:
     # projects in a workspace
     params = {"workspace": workspace_gid}
-    data = _get("/projects", params=params)
+    data = _get("/projects", params=params, conditional=True)
     out = []
     # fetch team name if possible (optional; keep simple)
     for p in data.get("data", []):
         out.append({"gid": p.get("gid"), "name": p.get("name")})
     return out
 
+def list_projects(workspace_gid: str) -> List[Dict[str, Any]]:
+    return _cached(f"projects:{workspace_gid}", lambda: _fetch_projects(workspace_gid))
+
 def _list_projects_all_workspaces() -> List[Dict[str, Any]]:
+    # one request per workspace, issued concurrently
     out = []
-    for ws in list_workspaces():
-        out.extend(list_projects(ws["gid"]))
+    for projs in _EXECUTOR.map(lambda ws: list_projects(ws["gid"]), list_workspaces()):
+        out.extend(projs)
     return out
 
+def _fetch_project(gid: str) -> Optional[Dict[str, Any]]:
+    try:
+        p = _get(f"/projects/{gid}").get("data", {})
+        return {"gid": p.get("gid"), "name": p.get("name")}
+    except Exception:
+        # ignore a bad/old gid
+        return None
+
+def _fetch_all_projects() -> List[Dict[str, Any]]:
+    ids = [s.strip() for s in ASANA_PROJECT_IDS_ENV.split(",") if s.strip()]
+    if ids:
+        # resolve just those specific projects by gid, concurrently
+        return [p for p in _EXECUTOR.map(_fetch_project, ids) if p]
+    # else: list all
+    return _list_projects_all_workspaces()
+
 def list_all_projects() -> List[Dict[str, Any]]:
     """
     Returns projects constrained by ASANA_PROJECT_IDS if provided,
     otherwise all projects from all accessible workspaces.
     """
-    ids = [s.strip() for s in ASANA_PROJECT_IDS_ENV.split(",") if s.strip()]
-    if ids:
-        # resolve just those specific projects by gid
-        out = []
-        for gid in ids:
-            try:
-                data = _get(f"/projects/{gid}")
-                p = data.get("data", {})
-                out.append({"gid": p.get("gid"), "name": p.get("name")})
-            except Exception:
-                # ignore a bad/old gid
-                pass
-        return out
-    # else: list all
-    return _list_projects_all_workspaces()
+    return _cached("all_projects", _fetch_all_projects)
 
-def _cache_get(key: str):
-    entry = _cache.get(key)
-    if not entry:
-        return None
-    if (time.time() - entry["ts"]) > entry["ttl"]:
-        return None
-    return entry["val"]
+_TASK_FIELDS = "name,notes,permalink_url,completed,assignee.name,projects.name"
 
-def _cache_put(key: str, val, ttl: int):
-    _cache[key] = {"val": val, "ts": time.time(), "ttl": ttl}
+def _iter_tasks_for_project(project_gid: str, limit: int):
+    """Follow next_page.offset cursors, stopping as soon as `limit` tasks were yielded."""
+    params: Dict[str, Any] = {"limit": min(limit, 100), "opt_fields": _TASK_FIELDS}  # Asana max page size is 100
+    yielded = 0
+    while True:
+        data = _get(f"/projects/{project_gid}/tasks", params=params, conditional=True)
+        for t in data.get("data", []):
+            yield t
+            yielded += 1
+            if yielded >= limit:
+                return
+        offset = (data.get("next_page") or {}).get("offset")
+        if not offset:
+            return
+        params["offset"] = offset
 
 def _list_tasks_for_project(project_gid: str, limit: int = 200) -> List[Dict[str, Any]]:
     """
     Fetch tasks for a project (NOT using premium workspace search).
-    We request a reasonable limit (Asana default pagination is 50).
+    Pages through results up to `limit` tasks.
+    """
+    return _cached(f"tasks:{project_gid}", lambda: list(_iter_tasks_for_project(project_gid, limit)))
+
+def _search_workspace_tasks(ws_gid: str, keyword: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Server-side keyword search (premium-only endpoint). Returns None when the
+    plan rejects it; a 402/403 is remembered per workspace for the cache TTL.
     """
-    cache_key = f"tasks:{project_gid}"
-    cached = _cache_get(cache_key)
-    if cached is not None:
-        return cached
-
-    # simple single-page fetch (increase if you need pagination)
-    params = {
-        "limit": min(limit, 200),
-        "opt_fields": "name,notes,permalink_url,completed,assignee.name,projects.name"
-    }
-    data = _get(f"/projects/{project_gid}/tasks", params=params)
-    tasks = data.get("data", [])
-    _cache_put(cache_key, tasks, ASANA_CACHE_TTL)
-    return tasks
+    denied_key = f"search_denied:{ws_gid}"
+    with _cache_lock:
+        entry = _cache.get(denied_key)
+    if entry is not None and (time.monotonic() - entry["ts"]) <= ASANA_CACHE_TTL:
+        return None
+    params: Dict[str, Any] = {"text": keyword, "limit": 100, "opt_fields": _TASK_FIELDS}
+    ids = [s.strip() for s in ASANA_PROJECT_IDS_ENV.split(",") if s.strip()]
+    if ids:
+        params["projects.any"] = ",".join(ids)
+    try:
+        data = _get(f"/workspaces/{ws_gid}/tasks/search", params=params)
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code in (402, 403):
+            _cache_put(denied_key, True)
+        return None
+    except Exception:
+        return None
+    return data.get("data", [])
+
+def _search_tasks(keyword: str) -> Optional[List[Dict[str, Any]]]:
+    """Search every workspace server-side; None if any workspace can't, so the caller scans locally."""
+    try:
+        workspaces = list_workspaces()
+    except Exception:
+        return None
+    out: List[Dict[str, Any]] = []
+    for found in _EXECUTOR.map(lambda ws: _search_workspace_tasks(ws["gid"], keyword), workspaces):
+        if found is None:
+            return None
+        out.extend(found)
+    return out
+
+def _safe_list_tasks(project_gid: str) -> List[Dict[str, Any]]:
+    try:
+        return _list_tasks_for_project(project_gid)
+    except Exception:
+        return []
 
 def refresh_asana_cache(force: bool = True) -> List[Dict[str, Any]]:
     """
     Preload tasks for configured projects (or all projects if none configured).
     Returns the list of projects it touched.
     """
+    if force:
+        # rebuild the project list from scratch so new workspaces/projects show up
+        _cache_drop("all_projects")
+        _cache_drop("workspaces")
+        _cache_drop_prefix("projects:")
     projs = list_all_projects()
     if not force:
         return projs
-    for p in projs:
-        gid = p.get("gid")
-        if not gid:
-            continue
-        try:
-            _list_tasks_for_project(gid)
-        except Exception:
-            # don't fail the whole refresh on one bad project
-            pass
+    # warm all projects concurrently; _safe_list_tasks swallows per-project
+    # errors so one bad project doesn't fail the whole refresh
+    list(_EXECUTOR.map(_safe_list_tasks, [p.get("gid") for p in projs if p.get("gid")]))
     return projs
 
 # ---------------------------
@@ -135,16 +285,19 @@ def _format_projects_bullets(projects: List[Dict[str, Any]]) -> str:
         lines.append("• …")
     return "\n".join(lines)
 
+_MAX_TASK_BULLETS = 10
+_WS_RE = re.compile(r"\s+")
+
 def _format_tasks_bullets(tasks: List[Dict[str, Any]], header: str = "Asana tasks") -> str:
     if not tasks:
         return "I couldn’t find matching Asana tasks."
     lines = [f"**{header}**", ""]
-    for t in tasks[:10]:
+    for t in tasks[:_MAX_TASK_BULLETS]:
         name = (t.get("name") or "").strip()
         url  = (t.get("permalink_url") or "").strip()
         proj = ", ".join([pp.get("name") for pp in (t.get("projects") or []) if pp.get("name")])
         snippet = (t.get("notes") or "").strip()
-        snippet = re.sub(r"\s+", " ", snippet)
+        snippet = _WS_RE.sub(" ", snippet)
         if len(snippet) > 140:
             snippet = snippet[:137] + "…"
         line = f"• {name}"
@@ -154,10 +307,14 @@ def _format_tasks_bullets(tasks: List[Dict[str, Any]], header: str = "Asana task
         if snippet:
             line += f"\n  {snippet}"
         lines.append(line)
-    if len(tasks) > 10:
+    if len(tasks) > _MAX_TASK_BULLETS:
         lines.append("• …")
     return "\n".join(lines)
 
+def _keyword_match(task: Dict[str, Any], pat: "re.Pattern[str]") -> bool:
+    # case-insensitive regex scan; avoids lowercasing every task field
+    return bool(pat.search(task.get("name") or "") or pat.search(task.get("notes") or ""))
+
 def asana_answer(question: str) -> str:
     """
     Lightweight intent:
@@ -174,7 +331,7 @@ def asana_answer(question: str) -> str:
         projs = list_all_projects()
         return _format_projects_bullets(projs)
 
-    # keyword task search (non-premium friendly)
+    # keyword task search (server-side when the plan allows, else local)
     # Extract a simple keyword phrase
     m = re.search(r"(tasks?\s+(about|for|with)\s+)(.+)", ql)
     keyword = (m.group(3).strip() if m else "").strip("'\" ")
@@ -182,22 +339,20 @@ def asana_answer(question: str) -> str:
         # fallback: use whole query as keyword after removing the word 'asana'
         keyword = ql.replace("asana", "").strip()
 
-    # collect tasks from projects, filter locally
     projs = list_all_projects()
     matched: List[Dict[str, Any]] = []
-    for p in projs:
-        gid = p.get("gid")
-        if not gid:
-            continue
-        try:
-            tasks = _list_tasks_for_project(gid)
-        except Exception:
-            continue
-        for t in tasks:
-            name = (t.get("name") or "").lower()
-            notes = (t.get("notes") or "").lower()
-            if keyword and (keyword in name or keyword in notes):
-                matched.append(t)
+    if keyword:
+        # prefer workspace search; otherwise collect tasks from projects
+        # (fetched concurrently) and filter locally
+        found = _search_tasks(keyword)
+        if found is not None:
+            matched = found
+        else:
+            pat = re.compile(re.escape(keyword), re.IGNORECASE)
+            for tasks in _EXECUTOR.map(_safe_list_tasks, [p.get("gid") for p in projs if p.get("gid")]):
+                matched.extend(t for t in tasks if _keyword_match(t, pat))
+                if len(matched) > _MAX_TASK_BULLETS:
+                    break  # enough to fill the answer (and its "…" marker)
 
     if not matched:
         # No matches; offer the list of projects as a hint.
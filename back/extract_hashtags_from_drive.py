@@ -1,5 +1,7 @@
 # extract_hashtags_from_drive.py
-import csv, re, sys
+import csv, mmap, os, re, sys
+from multiprocessing import Pool
+from collections import Counter
 from pathlib import Path
 
 # ----------------------------
@@ -15,88 +17,149 @@ INCLUDE_SOURCE_SUBSTRINGS = [
     r"\Upload\Upload Instagram and LinkedIn\Instagram\\",  # adjust to your actual folder names
 ]
 
+# Parallel scan of the unfiltered path: files above this size are split into
+# newline-aligned byte ranges and counted in a process pool.
+HASHTAG_WORKERS = int(os.getenv("HASHTAG_WORKERS", str(os.cpu_count() or 1)))
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+# lowercased once at import so _include_source doesn't redo it per row
+_INCLUDE_SUBS_LC = tuple(s.lower() for s in INCLUDE_SOURCE_SUBSTRINGS)
+_INCLUDE_SUBS_B = tuple(s.encode("utf-8") for s in _INCLUDE_SUBS_LC)
+
 # Lift CSV field-size limit (Drive export rows can be huge)
 try:
     csv.field_size_limit(sys.maxsize)
 except OverflowError:
     csv.field_size_limit(2**31 - 1)
 
-# Regex to match hashtags
-TAG_RE = re.compile(r"(#[A-Za-z0-9_]+)")
-counts: dict[str, int] = {}
+# Regex to match hashtags (bytes variant for the mmap scan and manual fallback)
+TAG_RE = re.compile(r"#[A-Za-z0-9_]+")
+TAG_RE_B = re.compile(rb"#[A-Za-z0-9_]+")
+counts: Counter = Counter()
 
 def _include_source(src: str) -> bool:
     """Check if a file path should be included based on INCLUDE_SOURCE_SUBSTRINGS."""
-    if not INCLUDE_SOURCE_SUBSTRINGS:
+    if not _INCLUDE_SUBS_LC:
         return True
     s = src.lower()
-    return any(sub.lower() in s for sub in INCLUDE_SOURCE_SUBSTRINGS)
+    return any(sub in s for sub in _INCLUDE_SUBS_LC)
 
 def _tally(text: str):
-    if not text:
+    # most cells carry no hashtag at all; a C-level "in" check skips the regex
+    if not text or "#" not in text:
         return
-    for tag in TAG_RE.findall(text):
-        t = tag.strip()
-        if not t:
-            continue
-        # normalize case so #UploadDigital == #uploaddigital
-        counts[t.lower()] = counts.get(t.lower(), 0) + 1
-
-def _read_with_csv_dictreader(path: Path) -> bool:
-    """Try to parse with DictReader (preferred)."""
+    # normalize case so #UploadDigital == #uploaddigital
+    counts.update(t.lower() for t in TAG_RE.findall(text))
+
+def _read_with_csv_reader(path: Path) -> bool:
+    """Parse with csv.reader, resolving the source/text columns once from the header."""
     try:
         with path.open("r", encoding="utf-8", newline="") as f:
-            rdr = csv.DictReader(f)
-            if not rdr.fieldnames:
+            rdr = csv.reader(f)
+            header = next(rdr, None)
+            if not header:
                 return False
-            # Find likely text and source columns
-            lower_fields = [h.lower() for h in rdr.fieldnames]
+            lower_fields = [h.strip().lower() for h in header]
+            src_i = lower_fields.index("source") if "source" in lower_fields else None
+            txt_i = lower_fields.index("text") if "text" in lower_fields else None
             for row in rdr:
-                src = row.get("source") or row.get("Source") or ""
-                txt = (
-                    row.get("text")
-                    or row.get("Text")
-                    or row.get("TEXT")
-                    or ""
-                )
-                if _include_source(src):
-                    _tally(txt)
+                src = row[src_i] if src_i is not None and src_i < len(row) else ""
+                if not _include_source(src):
+                    continue
+                if txt_i is not None and txt_i < len(row):
+                    _tally(row[txt_i])
         return True
     except csv.Error:
         return False
 
+def _count_range(args) -> Counter:
+    """Worker: count lowercased byte tags in mm[lo:hi] of its own mapping."""
+    path, lo, hi = args
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return Counter(m.lower() for m in TAG_RE_B.findall(mm, lo, hi))
+
+def _split_ranges(mm, size: int, n: int):
+    """Cut [0, size) into n ranges, each boundary moved forward past the next newline."""
+    bounds = [0]
+    for i in range(1, n):
+        nl = mm.find(b"\n", max(size * i // n, bounds[-1]))
+        cut = size if nl == -1 else nl + 1
+        if cut >= size:
+            break
+        bounds.append(cut)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+def _read_with_mmap(path: Path):
+    """
+    No source filter: every #tag in any cell counts, so skip CSV tokenizing
+    and run the bytes regex over the memory-mapped file. Large files are
+    split by line and scanned in parallel.
+    """
+    size = path.stat().st_size
+    if size == 0:
+        return  # mmap can't map an empty file
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if HASHTAG_WORKERS > 1 and size >= PARALLEL_MIN_BYTES:
+            ranges = _split_ranges(mm, size, HASHTAG_WORKERS)
+        else:
+            ranges = [(0, size)]
+        if len(ranges) == 1:
+            raw = Counter(m.lower() for m in TAG_RE_B.findall(mm))
+    if len(ranges) > 1:
+        with Pool(len(ranges)) as pool:
+            raw = Counter()
+            for part in pool.imap_unordered(_count_range, [(str(path), lo, hi) for lo, hi in ranges]):
+                raw.update(part)
+    # tags are pure ASCII by construction of the pattern
+    for tag, n in raw.items():
+        counts[tag.decode("ascii")] += n
+
 def _read_with_manual_fallback(path: Path):
-    """Fallback: simple CSV parsing when DictReader fails."""
-    with path.open("r", encoding="utf-8", newline="") as f:
-        header = f.readline()  # skip header line
+    """
+    Fallback: simple CSV parsing when csv.reader fails. Works on raw bytes so
+    lines rejected by the source filter are never split or decoded.
+    """
+    with path.open("rb") as f:
+        f.readline()  # skip header line
         for line in f:
-            line = line.rstrip("\n")
+            line = line.rstrip(b"\r\n")
             if not line:
                 continue
-            parts = line.split(",", 1)  # split only once
-            src = parts[0] if len(parts) > 0 else ""
-            text = parts[1] if len(parts) > 1 else ""
-            if _include_source(src):
-                _tally(text)
+            if _INCLUDE_SUBS_B:
+                # cheap whole-line pre-check before isolating the source column
+                low = line.lower()
+                if not any(sub in low for sub in _INCLUDE_SUBS_B):
+                    continue
+            src, _, text = line.partition(b",")  # split only once
+            if _INCLUDE_SUBS_B:
+                src_low = src.lower()
+                if not any(sub in src_low for sub in _INCLUDE_SUBS_B):
+                    continue
+            if b"#" in text:
+                counts.update(t.lower().decode("ascii") for t in TAG_RE_B.findall(text))
 
 def main():
     if not SRC.exists():
         print(f"[hashtags] missing {SRC}; nothing to do")
         return
 
-    ok = _read_with_csv_dictreader(SRC)
-    if not ok:
-        print("[hashtags] csv.DictReader failed, using manual fallback")
-        _read_with_manual_fallback(SRC)
+    if not INCLUDE_SOURCE_SUBSTRINGS:
+        # no per-row filtering needed → scan the raw file
+        _read_with_mmap(SRC)
+    else:
+        ok = _read_with_csv_reader(SRC)
+        if not ok:
+            print("[hashtags] csv.reader failed, using manual fallback")
+            _read_with_manual_fallback(SRC)
 
-    rows = sorted(counts.items(), key=lambda x: x[1], reverse=True)
+    rows = counts.most_common()
 
     OUT.parent.mkdir(parents=True, exist_ok=True)
     with OUT.open("w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=["hashtag", "freq"])
-        w.writeheader()
-        for tag, n in rows:
-            w.writerow({"hashtag": tag, "freq": n})
+        w = csv.writer(f)
+        w.writerow(("hashtag", "freq"))
+        w.writerows(rows)
 
     print(f"[hashtags] wrote {OUT} rows={len(rows)}")
     if rows[:10]:
@@ -10,6 +10,12 @@ SOURCES = [
 
 HASHTAG_RE = re.compile(r"#(\w+)", re.UNICODE)
 
+def _col(header, name):
+    try:
+        return header.index(name)
+    except ValueError:
+        return -1
+
 def main():
     counts = Counter()
     examples = {}  # keep one example source per hashtag
@@ -18,27 +24,32 @@ def main():
         if not os.path.exists(path):
             continue
         with open(path, "r", encoding="utf-8", newline="") as f:
-            reader = csv.DictReader(f)
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                continue
+            text_i, title_i, source_i = (_col(header, c) for c in ("text", "title", "source"))
             for row in reader:
-                text = (row.get("text") or "") + " " + (row.get("title") or "")
-                source = (row.get("source") or "").strip()
-                for tag in HASHTAG_RE.findall(text):
-                    ht = f"#{tag}"
-                    counts[ht] += 1
-                    if ht not in examples:
-                        examples[ht] = source
+                n = len(row)
+                text = row[text_i] if 0 <= text_i < n else ""
+                title = row[title_i] if 0 <= title_i < n else ""
+                # most rows carry no hashtag at all: skip them before any regex work
+                if "#" not in text and "#" not in title:
+                    continue
+                tags = [f"#{t}" for t in HASHTAG_RE.findall(text) + HASHTAG_RE.findall(title)]
+                counts.update(tags)
+                source = row[source_i].strip() if 0 <= source_i < n else ""
+                for ht in tags:
+                    examples.setdefault(ht, source)
 
     out_path = os.path.join(DATA_DIR, "instagram_hashtags.csv")
     with open(out_path, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=["text", "source"])
-        writer.writeheader()
+        writer = csv.writer(f)
+        writer.writerow(["text", "source"])
         # write each hashtag as its own short "document"
-        for ht, n in counts.most_common():
-            src = examples.get(ht, "")
-            writer.writerow({
-                "text": f"{ht} (frequency: {n})",
-                "source": src
-            })
+        writer.writerows(
+            [f"{ht} (frequency: {n})", examples.get(ht, "")] for ht, n in counts.most_common()
+        )
 
     print(f"Saved: {out_path} rows: {len(counts)}")
     if not counts:
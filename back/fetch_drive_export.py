@@ -3,35 +3,60 @@ warnings.filterwarnings("ignore", category=UserWarning)
 for noisy in ["pdfminer", "pdfplumber", "pypdfium2"]:
     logging.getLogger(noisy).setLevel(logging.ERROR)
 # fetch_drive_export.py
-import os, sys, re, csv, math, io, pathlib, chardet
+import os, sys, re, csv, math, io, mmap, pathlib, hashlib, zipfile
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import parent_process
 from pathlib import Path
 from dotenv import load_dotenv
+from charset_normalizer import from_bytes
 
 # Parsers
 import pdfplumber
+import pypdfium2 as pdfium
 from docx import Document as DocxDocument
 from bs4 import BeautifulSoup
 from openpyxl import load_workbook
 
+try:
+    from selectolax.parser import HTMLParser  # optional C-backed fast path
+except ImportError:
+    HTMLParser = None
+
+try:
+    from python_calamine import CalamineWorkbook  # optional Rust-backed xlsx reader
+except ImportError:
+    CalamineWorkbook = None
+
 load_dotenv()
 
 # --------- Config from .env ----------
 ROOT = Path(os.getenv("DRIVE_EXPORT_DIR", "")).expanduser()
-if not ROOT or not ROOT.exists():
-    print(f"[drive] DRIVE_EXPORT_DIR not found: {ROOT}")
-    sys.exit(1)
 
 INCLUDE_EXT = [e.strip().lower() for e in (os.getenv("DRIVE_INCLUDE_EXT", ".pdf,.docx,.xlsx,.html")).split(",") if e.strip()]
 EXCLUDE_DIRS = [d.strip().lower() for d in (os.getenv("DRIVE_EXCLUDE_DIRS", "__macosx,.git,.svn")).split(",") if d.strip()]
 MAX_MB = int(os.getenv("DRIVE_MAX_FILE_MB", "40"))
 DOC_CHAR_LIMIT = int(os.getenv("DRIVE_DOC_CHAR_LIMIT", "0"))  # 0 = no limit
+DRIVE_WORKERS = int(os.getenv("DRIVE_WORKERS", str(min(os.cpu_count() or 1, 8))))  # 1 = parse in-process
+DRIVE_PDF_WORKERS = int(os.getenv("DRIVE_PDF_WORKERS", "4"))  # page-range split for big PDFs
+PDF_PARALLEL_MIN_PAGES = 20
+
+INCLUDE_EXT_SET = set(INCLUDE_EXT)
+EXCLUDE_DIRS_SET = set(EXCLUDE_DIRS)
 
 DATA_DIR = Path(__file__).with_name("data")
 OUT_CSV = DATA_DIR / "drive_export_corpus.csv"
 
-def _skip_dir(p: Path) -> bool:
-    parts = [x.lower() for x in p.parts]
-    return any(ex in parts for ex in EXCLUDE_DIRS)
+# Parsed-text cache keyed by file content; bump PARSER_VERSION whenever a
+# parser's output changes so stale entries are ignored. The optional
+# backends in use are part of the key too, since they produce different text.
+PARSER_VERSION = "5"
+PARSER_BACKENDS = ",".join(name for name, mod in (
+    ("pdfium", pdfium), ("selectolax", HTMLParser), ("calamine", CalamineWorkbook),
+) if mod is not None)
+PARSE_CACHE_DIR = DATA_DIR / ".parse_cache"
+PARSE_CACHE_MAX_MB = int(os.getenv("DRIVE_PARSE_CACHE_MB", "512"))  # 0 = disabled
 
 def _size_ok(p: Path) -> bool:
     try:
@@ -40,20 +65,138 @@ def _size_ok(p: Path) -> bool:
     except Exception:
         return True
 
+_RE_NEWLINES = re.compile(r"\r\n?")
+_RE_BLANKS = re.compile(r"\n{3,}")
+_RE_SPACES = re.compile(r"[ \t]{2,}")
+
 def _clean_text(txt: str) -> str:
-    txt = txt.replace("\r\n", "\n").replace("\r", "\n")
-    txt = re.sub(r"\n{3,}", "\n\n", txt)         # collapse huge blank blocks
-    txt = re.sub(r"[ \t]{2,}", " ", txt)         # collapse double spaces
+    if "\r" in txt:
+        txt = _RE_NEWLINES.sub("\n", txt)      # \r\n and lone \r in one pass
+    txt = _RE_BLANKS.sub("\n\n", txt)         # collapse huge blank blocks
+    txt = _RE_SPACES.sub(" ", txt)            # collapse double spaces
     return txt.strip()
 
+def _extract_pdf_pages(args):
+    path, first, last = args  # 1-based, inclusive
+    with pdfplumber.open(path, pages=list(range(first, last + 1))) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+def _pdfium_text(path: Path) -> str:
+    pdf = pdfium.PdfDocument(str(path))
+    try:
+        pages = []
+        for i in range(len(pdf)):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            pages.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return "\n\n".join(pages)
+    finally:
+        pdf.close()
+
 def parse_pdf(path: Path) -> str:
+    # PDFium (C++) is much faster than pdfminer for plain text; pdfplumber
+    # is kept for files PDFium can't open. A file PDFium opens but finds no
+    # text in is a scan, and pdfplumber wouldn't find any either
+    try:
+        txt = _pdfium_text(path)
+    except Exception:
+        return _parse_pdf_plumber(path)
+    return _clean_text(txt)
+
+def _parse_pdf_plumber(path: Path) -> str:
     with pdfplumber.open(path) as pdf:
-        pages = []
-        for page in pdf.pages:
-            pages.append(page.extract_text() or "")
+        n = len(pdf.pages)
+        # split only from the main process: inside a DRIVE_WORKERS job the
+        # cores are already busy with other files
+        if n < PDF_PARALLEL_MIN_PAGES or DRIVE_PDF_WORKERS <= 1 or parent_process() is not None:
+            pages = []
+            for page in pdf.pages:
+                pages.append(page.extract_text() or "")
+            return _clean_text("\n\n".join(pages))
+    step = math.ceil(n / DRIVE_PDF_WORKERS)
+    ranges = [(str(path), i + 1, min(i + step, n)) for i in range(0, n, step)]
+    with ProcessPoolExecutor(max_workers=len(ranges)) as ex:
+        pages = [t for chunk in ex.map(_extract_pdf_pages, ranges) for t in chunk]
     return _clean_text("\n\n".join(pages))
 
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P, _W_R, _W_T, _W_TAB, _W_BR, _W_CR = _W + "p", _W + "r", _W + "t", _W + "tab", _W + "br", _W + "cr"
+_W_TBL, _W_TR, _W_TC = _W + "tbl", _W + "tr", _W + "tc"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+def _docx_text(path: Path) -> str:
+    """
+    Stream word/document.xml instead of building python-docx objects.
+    Same layout as the python-docx path: paragraphs first, then one
+    `cell | cell` line per row of each top-level table. Text-box paragraphs
+    (which python-docx skips) are kept once, from the mc:Choice branch.
+    """
+    paras, rows = [], []
+    bufs = []           # text pieces per open paragraph (they can nest in text boxes)
+    cell, row = [], []  # current top-level table cell / row
+    tbl_depth = 0
+    parents = []        # tags of the open elements
+    fallback = 0        # >0 inside mc:Fallback, a duplicate of the mc:Choice content
+    with zipfile.ZipFile(path) as z, z.open("word/document.xml") as f:
+        for event, el in ET.iterparse(f, events=("start", "end")):
+            tag = el.tag
+            if event == "start":
+                parents.append(tag)
+                if tag == _MC_FALLBACK:
+                    fallback += 1
+                elif fallback:
+                    pass
+                elif tag == _W_P:
+                    bufs.append([])
+                elif tag == _W_TBL:
+                    tbl_depth += 1
+                continue
+            parents.pop()
+            if tag == _MC_FALLBACK:
+                fallback -= 1
+                el.clear()
+                continue
+            if fallback:
+                continue
+            # t/tab/br/cr count only as run content: w:tab also defines the
+            # tab stops under w:pPr/w:tabs
+            in_run = bool(bufs) and parents[-1:] == [_W_R]
+            if tag == _W_T:
+                if in_run:
+                    bufs[-1].append(el.text or "")
+            elif tag == _W_TAB:
+                if in_run:
+                    bufs[-1].append("\t")
+            elif tag == _W_BR or tag == _W_CR:
+                if in_run:
+                    bufs[-1].append("\n")
+            elif tag == _W_P:
+                text = "".join(bufs.pop())
+                if tbl_depth == 0:
+                    paras.append(text)
+                    el.clear()
+                elif tbl_depth == 1:
+                    cell.append(text)
+            elif tbl_depth == 1 and tag == _W_TC:
+                row.append("\n".join(cell))
+                cell = []
+            elif tbl_depth == 1 and tag == _W_TR:
+                rows.append(" | ".join(row))
+                row = []
+            elif tag == _W_TBL:
+                tbl_depth -= 1
+                if tbl_depth == 0:
+                    el.clear()
+    return "\n".join(paras + rows)
+
 def parse_docx(path: Path) -> str:
+    try:
+        return _clean_text(_docx_text(path))
+    except (KeyError, zipfile.BadZipFile, ET.ParseError):
+        pass  # odd package layout: let python-docx try
+
     doc = DocxDocument(str(path))
     text = []
     for para in doc.paragraphs:
@@ -64,10 +207,37 @@ def parse_docx(path: Path) -> str:
             text.append(" | ".join([cell.text for cell in row.cells]))
     return _clean_text("\n".join(text))
 
+MMAP_MIN_BYTES = 1_000_000
+
+@contextmanager
+def _open_bytes(path: Path):
+    """Yield the file contents as a buffer: mmap for big files (no extra copy), bytes otherwise."""
+    if path.stat().st_size <= MMAP_MIN_BYTES:
+        yield path.read_bytes()
+        return
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        yield mm
+
+def _decode(raw) -> str:
+    # most exports are UTF-8: a strict decode is far cheaper than detection,
+    # and when it succeeds its result is the text, so nothing is decoded twice
+    try:
+        return str(raw, "utf-8")
+    except UnicodeDecodeError:
+        pass
+    best = from_bytes(raw[:65536]).best()  # sample only the head of the file
+    return str(raw, (best.encoding if best else None) or "utf-8", "ignore")
+
 def parse_html(path: Path) -> str:
-    raw = path.read_bytes()
-    enc = chardet.detect(raw).get("encoding") or "utf-8"
-    html = raw.decode(enc, errors="ignore")
+    with _open_bytes(path) as raw:
+        html = _decode(raw)
+    if HTMLParser is not None:
+        tree = HTMLParser(html)
+        # remove script/style
+        for tag in tree.css("script, style, noscript"):
+            tag.decompose()
+        txt = tree.root.text(separator="\n") if tree.root is not None else ""
+        return _clean_text(txt)
     soup = BeautifulSoup(html, "lxml")
     # remove script/style
     for tag in soup(["script","style","noscript"]):
@@ -77,9 +247,8 @@ def parse_html(path: Path) -> str:
 
 def _try_parse_text_as_csv_bytes(path: Path) -> str:
     # Some exports are mislabeled .xlsx but are actually CSV/TSV
-    raw = path.read_bytes()
-    enc = chardet.detect(raw).get("encoding") or "utf-8"
-    text = raw.decode(enc, errors="ignore")
+    with _open_bytes(path) as raw:
+        text = _decode(raw)
     # normalize tabs to commas if it looks TSV-ish
     if "\t" in text and "," not in text:
         lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
@@ -87,7 +256,52 @@ def _try_parse_text_as_csv_bytes(path: Path) -> str:
         return "\n".join([" | ".join(r) for r in rows])
     return text
 
+def _cell_str(v) -> str:
+    # calamine returns every number as float; print whole numbers the way
+    # openpyxl's ints do ("5", not "5.0") so both readers give the same text
+    if type(v) is float and v.is_integer():
+        return str(int(v))
+    return str(v)
+
+def _flatten_sheet(rows, lines: list):
+    """Append `Header: value | ...` lines for one sheet, streaming its rows."""
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    headers = [_cell_str(h).strip() if h is not None else "" for h in first]
+    # "Header: " prefixes are built once per sheet, not once per cell
+    prefixes = [f"{h}: " if h else "" for h in headers]
+    for r in rows:
+        parts = []
+        for prefix, v in zip(prefixes, r):
+            if v is None:
+                continue
+            val = _cell_str(v).strip()
+            if val:
+                parts.append(prefix + val)
+        if parts:
+            lines.append(" | ".join(parts))
+
+_ZIP_MAGIC = b"PK\x03\x04"
+
 def parse_xlsx(path: Path) -> str:
+    # a real .xlsx is a zip archive; anything else is a mislabeled CSV/TSV
+    # export, so skip the workbook readers and read the file just once
+    with path.open("rb") as f:
+        if f.read(4) != _ZIP_MAGIC:
+            return _clean_text(_try_parse_text_as_csv_bytes(path))
+
+    if CalamineWorkbook is not None:
+        try:
+            wb = CalamineWorkbook.from_path(str(path))
+            lines = []
+            for name in wb.sheet_names:
+                _flatten_sheet(wb.get_sheet_by_name(name).to_python(), lines)
+            return _clean_text("\n".join(lines))
+        except Exception:
+            pass  # let openpyxl / the CSV fallback have a go
+
     from openpyxl.utils.exceptions import InvalidFileException
     try:
         wb = load_workbook(filename=str(path), read_only=True, data_only=True)
@@ -100,18 +314,8 @@ def parse_xlsx(path: Path) -> str:
 
     lines = []
     for ws in wb.worksheets:
-        rows = list(ws.iter_rows(values_only=True))
-        if not rows:
-            continue
-        headers = [str(h).strip() if h is not None else "" for h in rows[0]]
-        for r in rows[1:]:
-            parts = []
-            for h, v in zip(headers, r):
-                val = "" if v is None else str(v).strip()
-                if val:
-                    parts.append(f"{h}: {val}" if h else val)
-            if parts:
-                lines.append(" | ".join(parts))
+        # iter_rows is consumed lazily; no per-sheet list of every row
+        _flatten_sheet(ws.iter_rows(values_only=True), lines)
     wb.close()
     return _clean_text("\n".join(lines))
 
@@ -123,53 +327,116 @@ def parse_file(path: Path) -> str:
     if ext == ".xlsx":  return parse_xlsx(path)
     return ""
 
-def main():
-    DATA_DIR.mkdir(exist_ok=True)
-    rows = []
-    file_count = 0
-    picked = 0
+def _content_key(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    h.update(f"|{path.suffix.lower()}|{PARSER_VERSION}|{PARSER_BACKENDS}".encode())
+    return h.hexdigest()
 
-    for p in ROOT.rglob("*"):
-        if p.is_dir():
-            if _skip_dir(p):
+def _cached_parse(path: Path) -> str:
+    """parse_file() with an on-disk cache so unchanged files are not re-parsed on the next run."""
+    if PARSE_CACHE_MAX_MB <= 0:
+        return parse_file(path)
+    cp = PARSE_CACHE_DIR / f"{_content_key(path)}.txt"
+    try:
+        txt = cp.read_text(encoding="utf-8")
+        os.utime(cp)  # mark as recently used for eviction
+        return txt
+    except FileNotFoundError:
+        pass
+    txt = parse_file(path)
+    PARSE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = cp.with_name(f"{cp.stem}.{os.getpid()}.tmp")  # workers may race on identical files
+    tmp.write_text(txt, encoding="utf-8")
+    os.replace(tmp, cp)
+    return txt
+
+def _prune_parse_cache():
+    """Drop least recently used entries until the cache fits in PARSE_CACHE_MAX_MB."""
+    if PARSE_CACHE_MAX_MB <= 0 or not PARSE_CACHE_DIR.exists():
+        return
+    entries = []
+    total = 0
+    for e in os.scandir(PARSE_CACHE_DIR):
+        if e.is_file():
+            st = e.stat()
+            entries.append((st.st_mtime, st.st_size, e.path))
+            total += st.st_size
+    budget = PARSE_CACHE_MAX_MB * 1024 * 1024
+    for _, size, fp in sorted(entries):
+        if total <= budget:
+            break
+        try:
+            os.remove(fp)
+            total -= size
+        except OSError:
+            pass
+
+def _iter_candidates():
+    for dirpath, dirs, files in os.walk(ROOT):
+        # prune excluded folders in place so os.walk never descends into them
+        dirs[:] = [d for d in dirs if d.lower() not in EXCLUDE_DIRS_SET]
+        for name in files:
+            if os.path.splitext(name)[1].lower() not in INCLUDE_EXT_SET:
                 continue
-            else:
+            p = Path(dirpath) / name
+            if not _size_ok(p):
+                print(f"[drive] skip >{MAX_MB}MB:", p)
                 continue
-        if _skip_dir(p.parent):
-            continue
+            yield p
 
-        ext = p.suffix.lower()
-        if ext not in INCLUDE_EXT:
-            continue
-        if not _size_ok(p):
-            print(f"[drive] skip >{MAX_MB}MB:", p)
-            continue
+def _parse_job(path: Path):
+    """Worker entry point: returns (path, text, error) so the parent does all printing/writing."""
+    try:
+        txt = _cached_parse(path)
+        if txt and DOC_CHAR_LIMIT > 0:
+            txt = txt[:DOC_CHAR_LIMIT]
+        return path, txt, None
+    except Exception as e:
+        return path, "", str(e)
 
-        file_count += 1
-        try:
-            txt = parse_file(p)
+def _parse_all(paths):
+    """Yield _parse_job results in input order, so the CSV row order is the same on every run."""
+    if DRIVE_WORKERS <= 1:
+        yield from map(_parse_job, paths)
+        return
+    with ProcessPoolExecutor(max_workers=DRIVE_WORKERS) as ex:
+        # small batches per worker round-trip; results stream back in order
+        yield from ex.map(_parse_job, paths, chunksize=4)
+
+def main():
+    if not ROOT or not ROOT.exists():
+        print(f"[drive] DRIVE_EXPORT_DIR not found: {ROOT}")
+        sys.exit(1)
+
+    DATA_DIR.mkdir(exist_ok=True)
+    candidates = list(_iter_candidates())
+    file_count = len(candidates)
+    picked = 0
+
+    # rows are written as results arrive, so memory doesn't grow with the corpus
+    with OUT_CSV.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=["source","text"])
+        w.writeheader()
+        for p, txt, err in _parse_all(candidates):
+            if err is not None:
+                print(f"[drive] error parsing {p}: {err}")
+                continue
             if not txt:
                 continue
-            if DOC_CHAR_LIMIT > 0:
-                txt = txt[:DOC_CHAR_LIMIT]
-            src = str(p)
-            rows.append({"source": src, "text": txt})
+            w.writerow({"source": str(p), "text": txt})
             picked += 1
             # progress
             if picked % 20 == 0:
                 print(f"[drive] parsed {picked} files...")
-        except Exception as e:
-            print(f"[drive] error parsing {p}: {e}")
 
-    with OUT_CSV.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["source","text"])
-        w.writeheader()
-        for r in rows:
-            w.writerow(r)
+    _prune_parse_cache()
 
     print(f"[drive] scanned files: {file_count}")
     print(f"[drive] parsed rows : {picked}")
-    print(f"[drive] saved       : {OUT_CSV} (rows={len(rows)})")
+    print(f"[drive] saved       : {OUT_CSV} (rows={picked})")
 
 if __name__ == "__main__":
     main()
@@ -48,36 +48,29 @@ def run():
     resp = client.run_report(request)
 
     # Normalize rows to: date, country, page, activeUsers, eventCount
-    rows_out = []
-    for r in resp.rows:
-        # GA v1beta returns .value for both dimension and metric values
-        dvals = [d.value for d in r.dimension_values]
-        mvals = [m.value for m in r.metric_values]
+    def _gen():
+        for r in resp.rows:
+            # GA v1beta returns .value for both dimension and metric values
+            dvals = [d.value for d in r.dimension_values]
+            mvals = [m.value for m in r.metric_values]
 
-        dt_raw   = (dvals[0] or "").strip() if len(dvals) > 0 else ""
-        country  = (dvals[1] or "").strip() if len(dvals) > 1 else ""
-        page_raw = (dvals[2] or "").strip() if len(dvals) > 2 else ""
+            dt_raw   = (dvals[0] or "").strip() if len(dvals) > 0 else ""
+            country  = (dvals[1] or "").strip() if len(dvals) > 1 else ""
+            page_raw = (dvals[2] or "").strip() if len(dvals) > 2 else ""
 
-        # date is YYYYMMDD → keep as is; server parses it
-        users  = (mvals[0] or "0").strip() if len(mvals) > 0 else "0"
-        events = (mvals[1] or "0").strip() if len(mvals) > 1 else "0"
+            # date is YYYYMMDD → keep as is; server parses it
+            users  = (mvals[0] or "0").strip() if len(mvals) > 0 else "0"
+            events = (mvals[1] or "0").strip() if len(mvals) > 1 else "0"
 
-        rows_out.append({
-            "date": dt_raw,
-            "country": country,
-            "page": page_raw,
-            "activeUsers": users,
-            "eventCount": events,
-        })
+            yield (dt_raw, country, page_raw, users, events)
 
-    # Write CSV
+    # Write CSV straight from the response: positional tuples, no row list
     with OUT.open("w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=["date","country","page","activeUsers","eventCount"])
-        w.writeheader()
-        for row in rows_out:
-            w.writerow(row)
+        w = csv.writer(f)
+        w.writerow(["date", "country", "page", "activeUsers", "eventCount"])
+        w.writerows(_gen())
 
-    print(f"[ga] wrote {OUT} rows={len(rows_out)}")
+    print(f"[ga] wrote {OUT} rows={len(resp.rows)}")
 
 if __name__ == "__main__":
     run()
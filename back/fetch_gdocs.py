@@ -1,8 +1,10 @@
 # fetch_gdocs.py
 import os
 import re
+import codecs
 import csv
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -14,6 +16,7 @@ DOC_CHAR_LIMIT = int(os.getenv("DOC_CHAR_LIMIT", "0")) or None
 
 REQUESTS_VERIFY_SSL = os.getenv("REQUESTS_VERIFY_SSL", "true").strip().lower() != "false"
 TIMEOUT_SECS = int(os.getenv("REQUEST_TIMEOUT_SECS", "40"))
+DOCS_WORKERS = int(os.getenv("DOCS_WORKERS", "8"))  # concurrent doc exports
 
 def _valid_proxy(url: str | None) -> str | None:
     if not url:
@@ -49,7 +52,7 @@ def _session() -> requests.Session:
         allowed_methods=("GET", "HEAD"),
         raise_on_status=False,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(pool_maxsize=DOCS_WORKERS, max_retries=retry)
     s.mount("https://", adapter)
     s.mount("http://", adapter)
     if PROXIES:
@@ -57,29 +60,50 @@ def _session() -> requests.Session:
     s.headers.update(HEADERS)
     return s
 
-def export_text(url: str) -> str:
-    m = re.search(r"document/d/([A-Za-z0-9-_]+)", url)
+# one session for the whole run: every export hits docs.google.com, so
+# keep-alive connections skip a TLS handshake per doc
+_SESSION = _session()
+
+_DOC_ID_RE = re.compile(r"document/d/([A-Za-z0-9-_]+)")
+
+def export_text(url: str, sess: requests.Session | None = None) -> str:
+    m = _DOC_ID_RE.search(url)
     if not m:
         print("[docs] Bad doc URL:", url)
         return ""
     doc_id = m.group(1)
     export = f"https://docs.google.com/document/d/{doc_id}/export?format=txt"
-    s = _session()
+    s = sess or _SESSION
     try:
-        r = s.get(export, timeout=TIMEOUT_SECS, verify=REQUESTS_VERIFY_SSL, allow_redirects=True)
-        if r.status_code != 200:
-            print("[docs] Failed export (not public?)", url, r.status_code)
-            return ""
-        txt = r.text
-        return txt[:DOC_CHAR_LIMIT] if DOC_CHAR_LIMIT else txt
+        with s.get(export, timeout=TIMEOUT_SECS, verify=REQUESTS_VERIFY_SSL,
+                   allow_redirects=True, stream=True) as r:
+            if r.status_code != 200:
+                print("[docs] Failed export (not public?)", url, r.status_code)
+                return ""
+            if not DOC_CHAR_LIMIT:
+                return r.text
+            # decode as it arrives and stop downloading once the limit is reached
+            dec = codecs.getincrementaldecoder(r.encoding or "utf-8")(errors="replace")
+            parts, n = [], 0
+            for chunk in r.iter_content(chunk_size=64 * 1024):
+                part = dec.decode(chunk)
+                parts.append(part)
+                n += len(part)
+                if n >= DOC_CHAR_LIMIT:
+                    break
+            else:
+                parts.append(dec.decode(b"", final=True))
+            return "".join(parts)[:DOC_CHAR_LIMIT]
     except requests.RequestException as e:
         print(f"[docs] Network error for {url}: {e}")
         return ""
 
 def main():
     rows = []
-    for d in DOC_URLS:
-        txt = export_text(d)
+    # exports are independent network-bound calls; map() keeps DOC_URLS order
+    with ThreadPoolExecutor(max_workers=DOCS_WORKERS) as ex:
+        texts = list(ex.map(export_text, DOC_URLS))
+    for d, txt in zip(DOC_URLS, texts):
         if txt.strip():
             rows.append({"source": d, "text": txt})
             print("Indexed Google Doc:", d, f"(len={len(txt)})")
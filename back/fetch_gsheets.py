@@ -1,18 +1,34 @@
 # fetch_gsheets.py
+import io
 import os
 import re
 import csv
 import json
 import requests
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+
+try:
+    import orjson
+
+    def _write_json(path: str, obj) -> None:
+        with open(path, "wb") as jf:
+            jf.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+except ImportError:
+    def _write_json(path: str, obj) -> None:
+        with open(path, "w", encoding="utf-8") as jf:
+            json.dump(obj, jf, ensure_ascii=False, indent=2)
 
 load_dotenv()
 
 SHEET_URLS = [s.strip() for s in os.getenv("SHEET_URLS", "").split(",") if s.strip()]
 REQUESTS_VERIFY_SSL = os.getenv("REQUESTS_VERIFY_SSL", "true").strip().lower() != "false"
 TIMEOUT_SECS = int(os.getenv("REQUEST_TIMEOUT_SECS", "40"))
+SHEETS_WORKERS = int(os.getenv("SHEETS_WORKERS", "8"))  # concurrent sheet exports
 
 # optional: comma-separated list of column names you expect (case-insensitive)
 HASHTAG_COLUMNS = [c.strip().lower() for c in os.getenv("HASHTAG_COLUMNS", "").split(",") if c.strip()]
@@ -39,148 +55,122 @@ def _session() -> requests.Session:
     retry = Retry(total=5, backoff_factor=0.8,
                   status_forcelist=(429, 500, 502, 503, 504),
                   allowed_methods=("GET","HEAD"), raise_on_status=False)
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(pool_maxsize=SHEETS_WORKERS, max_retries=retry)
     s.mount("https://", adapter); s.mount("http://", adapter)
     if PROXIES: s.proxies.update(PROXIES)
     s.headers.update(HEADERS)
     return s
 
-def export_csv_text(url: str):
-    m = re.search(r"/spreadsheets/d/([A-Za-z0-9-_]+)", url)
+# one session for the whole run, shared by the export threads
+_SESSION = _session()
+
+_SHEET_ID_RE = re.compile(r"/spreadsheets/d/([A-Za-z0-9-_]+)")
+
+def export_csv_text(url: str, sess: requests.Session | None = None):
+    m = _SHEET_ID_RE.search(url)
     if not m:
         print("[sheets] Bad sheet URL:", url); return [], []
     sid = m.group(1)
     export = f"https://docs.google.com/spreadsheets/d/{sid}/export?format=csv"
-    s = _session()
+    s = sess or _SESSION
     try:
-        r = s.get(export, timeout=TIMEOUT_SECS, verify=REQUESTS_VERIFY_SSL, allow_redirects=True)
-        if r.status_code != 200:
-            print("[sheets] Failed export (not public?)", url, r.status_code); return [], []
-        lines = r.text.splitlines()
-        rows = list(csv.reader(lines))
-        headers = rows[0] if rows else []
-        data = rows[1:] if len(rows) > 1 else []
+        with s.get(export, timeout=TIMEOUT_SECS, verify=REQUESTS_VERIFY_SSL,
+                   allow_redirects=True, stream=True) as r:
+            if r.status_code != 200:
+                print("[sheets] Failed export (not public?)", url, r.status_code); return [], []
+            # parse straight off the socket: no full-text str or line list
+            # alongside the parsed rows (newline="" keeps quoted newlines intact)
+            r.raw.decode_content = True
+            reader = csv.reader(io.TextIOWrapper(r.raw, encoding=r.encoding or "utf-8", newline=""))
+            headers = next(reader, [])
+            data = list(reader)
         return headers, data
-    except requests.RequestException as e:
+    except (requests.RequestException, Urllib3HTTPError) as e:  # r.raw reads raise urllib3's own errors
         print(f"[sheets] Network error for {url}: {e}"); return [], []
 
-def row_to_text(headers, row):
-    if headers:
-        parts = []
-        for h, v in zip(headers, row):
-            v = (v or "").strip()
-            if v: parts.append(f"{h.strip()}: {v}")
-        return " | ".join(parts) if parts else " | ".join([c.strip() for c in row if (c or '').strip()])
-    return " | ".join([c.strip() for c in row if (c or '').strip()])
-
 # --- hashtag helpers ---------------------------------------------------------
 
-HASHTAG_RE = re.compile(r"#([A-Za-z0-9_]+)")
+HASHTAG_RE = re.compile(r"#[A-Za-z0-9_]+")  # match includes the '#'
 
-def _collect_hashtags_from_text(text: str) -> list[str]:
-    # return raw hashtags with leading '#', de-duplicated within this text
-    tags = set()
-    for m in HASHTAG_RE.finditer(text or ""):
-        tag = "#" + m.group(1)
-        tags.add(tag)
-    return list(tags)
-
-def _collect_hashtags(headers, data_rows):
+def _hashtag_scan_indices(headers) -> set[int]:
     """
-    Strategy:
-      1) If specific HASHTAG_COLUMNS are set, scan only those headers (if present).
-      2) Otherwise, scan ALL cells of every row for #tags.
-      3) Sum frequencies across sheets and rows.
+    Column indices to scan for #tags:
+      1) If specific HASHTAG_COLUMNS are set, only those headers (if present).
+      2) Otherwise (or if none of them exist) an empty set, meaning ALL cells.
     """
-    freq: dict[str, int] = {}
-
+    if not (HASHTAG_COLUMNS and headers):
+        return set()
     # Map header name -> index
-    hdr_idx = { (h or "").strip().lower(): i for i, h in enumerate(headers or []) }
-
-    # Choose which column indices to scan (if provided)
-    indices_to_scan = set()
-    if HASHTAG_COLUMNS and headers:
-        for want in HASHTAG_COLUMNS:
-            if want in hdr_idx:
-                indices_to_scan.add(hdr_idx[want])
-
-    for row in data_rows:
-        texts = []
-        if indices_to_scan:
-            for i in indices_to_scan:
-                if i < len(row) and (row[i] or "").strip():
-                    texts.append(row[i])
-        else:
-            # scan all cells
-            texts.extend([c for c in row if (c or "").strip()])
-
-        # gather unique tags in this row
-        row_tags = set()
-        for t in texts:
-            for tag in _collect_hashtags_from_text(t):
-                row_tags.add(tag)
-
-        for tag in row_tags:
-            freq[tag] = freq.get(tag, 0) + 1
-
-    # convert to sorted list
-    items = [{"hashtag": k, "frequency": v} for k, v in freq.items()]
-    items.sort(key=lambda x: x["frequency"], reverse=True)
-    return items
+    hdr_idx = { (h or "").strip().lower(): i for i, h in enumerate(headers) }
+    return {hdr_idx[want] for want in HASHTAG_COLUMNS if want in hdr_idx}
+
+def process_row(headers, row, scan_idx: set[int]) -> tuple[str, set[str]]:
+    """RAG text and the unique hashtags of one row, built in a single pass over its cells."""
+    parts = []     # "header: value" for cells under a header
+    cells = []     # every non-empty cell, the fallback text
+    tags = set()
+    n_headers = len(headers or [])
+    for i, c in enumerate(row):
+        v = (c or "").strip()
+        if not v:
+            continue
+        cells.append(v)
+        if i < n_headers:
+            parts.append(f"{headers[i].strip()}: {v}")
+        if "#" in v and (not scan_idx or i in scan_idx):
+            tags.update(HASHTAG_RE.findall(v))
+    return " | ".join(parts or cells), tags
 
 # --- main --------------------------------------------------------------------
 
 def main():
-    rows_out = []
-    all_hashtags = []
-
-    for url in SHEET_URLS:
-        headers, data = export_csv_text(url)
-        if not data:
-            print("[sheets] No rows parsed for", url); continue
-
-        # RAG rows
-        for idx, r in enumerate(data, 1):
-            text = row_to_text(headers, r)
-            if text:
-                rows_out.append({"source": f"{url}#row={idx}", "text": text})
-
-        # Hashtags by scanning columns or all cells
-        tags = _collect_hashtags(headers, data)
-        if tags:
-            print(f"[sheets] Found {len(tags)} unique hashtags in", url)
-            all_hashtags.extend(tags)
-        else:
-            print(f"[sheets] No hashtags found in {url}")
-
-        print(f"Indexed sheet: {url} rows={len(data)}")
+    agg = Counter()  # hashtag -> rows containing it, summed across sheets
+    n_rows = 0
 
     os.makedirs("data", exist_ok=True)
 
-    # Save corpus for RAG
+    # Save corpus for RAG: rows are written as each sheet is processed, so no
+    # corpus-wide row list is ever held in memory
     out_csv = os.path.join("data", "gsheets_corpus.csv")
-    with open(out_csv, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["source", "text"])
-        w.writeheader()
-        for r in rows_out:
-            w.writerow(r)
-    print("Saved:", out_csv, "rows:", len(rows_out))
+    with open(out_csv, "w", newline="", encoding="utf-8") as f, \
+            ThreadPoolExecutor(max_workers=max(1, min(SHEETS_WORKERS, len(SHEET_URLS)))) as ex:
+        w = csv.writer(f)
+        w.writerow(["source", "text"])
+        # downloads are independent and network-bound; map() yields in
+        # SHEET_URLS order so the parsing below stays serial and deterministic
+        for url, (headers, data) in zip(SHEET_URLS, ex.map(export_csv_text, SHEET_URLS)):
+            if not data:
+                print("[sheets] No rows parsed for", url); continue
+
+            # RAG rows and hashtags (chosen columns or all cells) in one pass;
+            # each tag counts once per row, summed across rows
+            scan_idx = _hashtag_scan_indices(headers)
+            freq = Counter()
+            prefix = url + "#row="
+            for idx, r in enumerate(data, 1):
+                text, row_tags = process_row(headers, r, scan_idx)
+                if text:
+                    w.writerow((prefix + str(idx), text))
+                    n_rows += 1
+                freq.update(row_tags)
+
+            if freq:
+                print(f"[sheets] Found {len(freq)} unique hashtags in", url)
+                agg.update(freq)
+            else:
+                print(f"[sheets] No hashtags found in {url}")
+
+            print(f"Indexed sheet: {url} rows={len(data)}")
+    print("Saved:", out_csv, "rows:", n_rows)
 
     # Merge & save hashtags (sum same tags across sheets)
     out_json = os.path.join("data", "instagram_hashtags.json")
-    if all_hashtags:
-        agg: dict[str, int] = {}
-        for item in all_hashtags:
-            tag = item["hashtag"]
-            agg[tag] = agg.get(tag, 0) + int(item.get("frequency") or 0)
-        final = [{"hashtag": t, "frequency": f} for t, f in agg.items()]
-        final.sort(key=lambda x: x["frequency"], reverse=True)
-        with open(out_json, "w", encoding="utf-8") as jf:
-            json.dump(final, jf, ensure_ascii=False, indent=2)
+    if agg:
+        final = [{"hashtag": t, "frequency": f} for t, f in agg.most_common()]
+        _write_json(out_json, final)
         print("[sheets] Saved hashtag cache:", out_json, "items:", len(final))
     else:
-        with open(out_json, "w", encoding="utf-8") as jf:
-            json.dump([], jf)
+        _write_json(out_json, [])
         print("[sheets] No hashtags detected; wrote empty", out_json)
 
 if __name__ == "__main__":
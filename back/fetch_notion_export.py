@@ -1,11 +1,18 @@
 # fetch_notion_export.py
 import os
 import csv
+import mmap
 import sys
+from collections import Counter
 from pathlib import Path
 
 from bs4 import BeautifulSoup
 
+try:
+    from selectolax.parser import HTMLParser  # optional C-backed fast path
+except ImportError:
+    HTMLParser = None
+
 # ---------- Config ----------
 # Prefer .env override; else default to your path
 NOTION_EXPORT_DIR = os.getenv("NOTION_EXPORT_DIR", r"C:\Users\Admin\Desktop\notionexport")
@@ -13,25 +20,44 @@ EXPORT_DIR = Path(NOTION_EXPORT_DIR)
 OUT = Path(__file__).with_name("data") / "notion_export_corpus.csv"
 
 # Which file types to ingest
-PATTERNS = ["*.html", "*.htm", "*.md", "*.txt", "*.csv"]
+EXTS = {".html", ".htm", ".md", ".txt", ".csv"}
 
 # ---------- Helpers ----------
-def _read_text(path: Path) -> str:
-    """
-    Read a text file with best-effort encoding handling.
-    """
+MMAP_MIN_BYTES = 1_000_000
+
+def _decode(raw) -> str:
     # Try utf-8 first
     try:
-        return path.read_text(encoding="utf-8", errors="strict")
+        return str(raw, "utf-8", "strict")
     except UnicodeDecodeError:
         # BOM or mixed encodings
         try:
-            return path.read_text(encoding="utf-8-sig", errors="strict")
+            return str(raw, "utf-8-sig", "strict")
         except UnicodeDecodeError:
             # Last resort: ignore errors
-            return path.read_text(encoding="utf-8", errors="ignore")
+            return str(raw, "utf-8", "ignore")
+
+def _read_text(path: Path) -> str:
+    """
+    Read a text file with best-effort encoding handling.
+    Large files are decoded straight from an mmap instead of a bytes copy.
+    """
+    if path.stat().st_size <= MMAP_MIN_BYTES:
+        text = _decode(path.read_bytes())
+    else:
+        with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = _decode(mm)
+    # same universal-newline handling read_text() applied
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
 
 def _html_to_text(html: str) -> str:
+    if HTMLParser is not None:
+        tree = HTMLParser(html)
+        for bad in tree.css("script, style, noscript"):
+            bad.decompose()
+        return tree.root.text(separator=" ", strip=True) if tree.root is not None else ""
     soup = BeautifulSoup(html, "lxml")
     for bad in soup(["script", "style", "noscript"]):
         bad.extract()
@@ -82,15 +108,16 @@ def main():
         print("Hint: Set NOTION_EXPORT_DIR in .env or update the path in this script.")
         sys.exit(1)
 
-    # Gather files
-    files = []
-    for pat in PATTERNS:
-        files.extend(EXPORT_DIR.rglob(pat))
+    # Gather files in a single walk (each file is seen once)
+    files = [
+        Path(dirpath) / name
+        for dirpath, _, names in os.walk(EXPORT_DIR)
+        for name in names
+        if os.path.splitext(name)[1].lower() in EXTS
+    ]
 
     # Debug logging to ensure we’re seeing files
-    counts = {}
-    for p in files:
-        counts[p.suffix.lower()] = counts.get(p.suffix.lower(), 0) + 1
+    counts = Counter(p.suffix.lower() for p in files)
 
     print(f"[notion] scanning in: {EXPORT_DIR}")
     if not files:
@@ -104,23 +131,23 @@ def main():
         for sample in files[:3]:
             print(f"[notion] sample: {sample}")
 
-    rows = []
-    for fp in files:
-        try:
-            text = extract_text(fp)
-            if text.strip():
-                rows.append({"source": str(fp), "text": text})
-        except Exception as e:
-            print(f"[notion] Error reading {fp}: {e}")
-
+    # write each document as soon as it is extracted so memory stays flat
     OUT.parent.mkdir(parents=True, exist_ok=True)
+    n_rows = 0
     with OUT.open("w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=["source", "text"])
         w.writeheader()
-        for r in rows:
-            w.writerow(r)
+        for fp in files:
+            try:
+                text = extract_text(fp)
+                if text.strip():
+                    w.writerow({"source": str(fp), "text": text})
+                    n_rows += 1
+                del text
+            except Exception as e:
+                print(f"[notion] Error reading {fp}: {e}")
 
-    print(f"[notion] Saved: {OUT} rows={len(rows)}")
+    print(f"[notion] Saved: {OUT} rows={n_rows}")
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,9 @@
 # back/gmail_client.py
 from __future__ import annotations
-import os, json
+import os, json, threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
@@ -23,7 +24,7 @@ def _ensure_key_files_from_env():
     if t_env and not TOKEN_PATH.exists():
         TOKEN_PATH.write_text(t_env, encoding="utf-8")
 
-def get_service():
+def _load_creds() -> Credentials:
     _ensure_key_files_from_env()
     creds = None
     if TOKEN_PATH.exists():
@@ -34,30 +35,104 @@ def get_service():
             TOKEN_PATH.write_text(creds.to_json(), encoding="utf-8")
         else:
             raise RuntimeError("Gmail token.json missing/invalid on server.")
-    return build("gmail", "v1", credentials=creds)
+    return creds
+
+# credentials are shared; built services are pooled at module level and
+# checked out one caller at a time, because the underlying httplib2
+# connection is not thread-safe. (A threading.local would be per greenlet
+# under gevent workers, i.e. a fresh build on every request.)
+_creds = None
+_creds_lock = threading.Lock()
+_SVC_POOL_MAX = 4
+_svc_pool: List[Tuple[Credentials, object]] = []  # idle (creds, service) pairs
+_svc_pool_lock = threading.Lock()
+
+def _get_creds() -> Credentials:
+    global _creds
+    with _creds_lock:
+        if _creds is None or not _creds.valid:
+            _creds = _load_creds()
+        return _creds
+
+@contextmanager
+def _service():
+    """Check out a Gmail service for exclusive use; it goes back to the pool afterwards."""
+    creds = _get_creds()
+    svc = None
+    with _svc_pool_lock:
+        while _svc_pool:
+            c, s = _svc_pool.pop()
+            if c is creds:
+                svc = s
+                break
+            # built with credentials that have since been reloaded: drop it
+    if svc is None:
+        svc = build("gmail", "v1", credentials=creds, cache_discovery=False)
+    try:
+        yield svc
+    finally:
+        with _svc_pool_lock:
+            if len(_svc_pool) < _SVC_POOL_MAX:
+                _svc_pool.append((creds, svc))
+
+def get_service():
+    """A Gmail service for the caller's own use (not shared with the pool)."""
+    return build("gmail", "v1", credentials=_get_creds(), cache_discovery=False)
+
+def refresh_service():
+    """Drop cached credentials/services, e.g. after replacing token.json."""
+    global _creds
+    with _creds_lock:
+        _creds = None
+    with _svc_pool_lock:
+        _svc_pool.clear()
 
 def whoami() -> str:
-    svc = get_service()
-    prof = svc.users().getProfile(userId="me").execute()
+    with _service() as svc:
+        prof = svc.users().getProfile(userId="me").execute()
     return prof.get("emailAddress", "(unknown)")
 
 def list_messages(max_results: int = 10, q: str = "") -> List[Dict]:
-    svc = get_service()
-    resp = svc.users().messages().list(userId="me", maxResults=max_results, q=q).execute()
+    with _service() as svc:
+        resp = svc.users().messages().list(userId="me", maxResults=max_results, q=q).execute()
     return resp.get("messages", [])
 
+_BATCH_MAX = 50  # Gmail allows 100 per batch but recommends <=50; bigger batches hit per-user 429s
+
+def _format_snippet(m: Dict) -> str:
+    snippet = m.get("snippet", "")
+    headers = {h["name"]: h["value"] for h in m.get("payload", {}).get("headers", [])}
+    subj = headers.get("Subject", "(no subject)")
+    frm = headers.get("From", "(unknown)")
+    dt  = headers.get("Date", "")
+    return f"• {subj} — {frm} — {dt}\n  {snippet}"
+
 def fetch_snippets(msg_ids: List[str]) -> List[str]:
-    svc = get_service()
-    out = []
-    for mid in msg_ids:
-        m = svc.users().messages().get(userId="me", id=mid, format="metadata", metadataHeaders=["Subject","From","Date","Snippet"]).execute()
-        snippet = m.get("snippet", "")
-        headers = {h["name"]: h["value"] for h in m.get("payload", {}).get("headers", [])}
-        subj = headers.get("Subject", "(no subject)")
-        frm = headers.get("From", "(unknown)")
-        dt  = headers.get("Date", "")
-        out.append(f"• {subj} — {frm} — {dt}\n  {snippet}")
-    return out
+    """Fetch message metadata with batched requests (one HTTP round-trip per _BATCH_MAX ids)."""
+    if not msg_ids:
+        return []
+    results: Dict[str, Dict] = {}
+    errors: List[Exception] = []
+
+    def _on_response(request_id, response, exception):
+        if exception is not None:
+            errors.append(exception)
+        else:
+            results[request_id] = response
+
+    with _service() as svc:
+        for start in range(0, len(msg_ids), _BATCH_MAX):
+            batch = svc.new_batch_http_request(callback=_on_response)
+            for i, mid in enumerate(msg_ids[start:start + _BATCH_MAX], start):
+                batch.add(
+                    svc.users().messages().get(userId="me", id=mid, format="metadata", metadataHeaders=["Subject","From","Date","Snippet"]),
+                    request_id=str(i),
+                )
+            batch.execute()
+    if errors:
+        raise errors[0]
+    # keep the order of msg_ids
+    return [_format_snippet(results[str(i)]) for i in range(len(msg_ids))]
 
 def quick_summary(limit=5, q=""):
     msgs = list_messages(max_results=limit, q=q)
@@ -1,10 +1,18 @@
 import csv
 import os 
-from qdrant_client.models import PointStruct
-from server import embed_text
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np  # ships with qdrant-client
+from qdrant_client.models import OptimizersConfigDiff
+from openai_integration import embed_texts
 from qdrant_client import QdrantClient
 
 
+EMBED_BATCH = 128  # texts per embeddings request
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "4"))  # concurrent embedding requests
+MAX_IN_FLIGHT = 8  # embedded batches waiting to be upserted
+INDEXING_THRESHOLD = int(os.getenv("QDRANT_INDEXING_THRESHOLD", "20000"))  # restore fallback if unset/0
+
 client = QdrantClient(
     url=os.getenv("QDRANT_URL"),
     api_key=os.getenv("QDRANT_API_KEY"),
@@ -15,18 +23,48 @@ def ingest_sheets_to_qdrant():
     COLLECTION = os.getenv("QDRANT_COLLECTION", "company_knowledge")
     with open("data/gsheets_corpus.csv", "r", encoding="utf-8") as f:
         reader = csv.DictReader(f)
-        points = []
-        idx = 1
-        for row in reader:
-            text = row["text"]
-            vec = embed_text(text)
-            points.append(PointStruct(
-                id=idx,
-                vector=vec,
-                payload={"text": text, "source": row["source"]}
-            ))
-            idx += 1
-    client.upsert(collection_name=COLLECTION, points=points)
+        rows = list(reader)
+    # embedding requests are network-bound: run EMBED_WORKERS batches at a
+    # time; futures are drained in submission order so point ids stay row-ordered
+    batches = [rows[i:i + EMBED_BATCH] for i in range(0, len(rows), EMBED_BATCH)]
+    idx = 1
+    # pause HNSW indexing for the bulk load; Qdrant indexes once afterwards.
+    # Put back the collection's own threshold (0 = left paused by a crashed run)
+    restore_threshold = (client.get_collection(COLLECTION).config.optimizer_config.indexing_threshold
+                         or INDEXING_THRESHOLD)
+    client.update_collection(collection_name=COLLECTION,
+                             optimizer_config=OptimizersConfigDiff(indexing_threshold=0))
+    try:
+        with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as ex:
+            # upsert each batch as soon as it's embedded: bounded request size,
+            # and Qdrant writes overlap the embedding calls still in flight.
+            # At most MAX_IN_FLIGHT batches are submitted ahead of the upserts,
+            # so embedded vectors don't pile up in memory
+            in_flight = deque()
+
+            def drain(limit: int):
+                nonlocal idx
+                while len(in_flight) > limit:
+                    batch, fut = in_flight.popleft()
+                    # one (n, dim) float32 block instead of n lists of Python
+                    # floats; the client serializes the array directly
+                    client.upload_collection(
+                        collection_name=COLLECTION,
+                        vectors=np.asarray(fut.result(), dtype=np.float32),
+                        payload=[{"text": row["text"], "source": row["source"]} for row in batch],
+                        ids=list(range(idx, idx + len(batch))),
+                        batch_size=EMBED_BATCH,
+                        wait=True,
+                    )
+                    idx += len(batch)
+
+            for batch in batches:
+                in_flight.append((batch, ex.submit(embed_texts, [r["text"] for r in batch])))
+                drain(MAX_IN_FLIGHT)
+            drain(0)
+    finally:
+        client.update_collection(collection_name=COLLECTION,
+                                 optimizer_config=OptimizersConfigDiff(indexing_threshold=restore_threshold))
     print(f"Ingested {idx-1} rows into Qdrant.")
 
 
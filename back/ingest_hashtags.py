@@ -1,6 +1,6 @@
 # ingest_hashtags.py
 import os, csv, uuid
-from openai_integration import embed_text
+from openai_integration import embed_texts
 from qdrant_rest import ensure_collection, upsert_points
 
 DATA_FILE = os.path.join(os.path.dirname(__file__), "data", "instagram_hashtags.csv")
@@ -11,7 +11,25 @@ def main():
         print(f"Missing {DATA_FILE}. Run extract_instagram_hashtags.py first.")
         return
 
-    points = []
+    # one embeddings request and one upsert per batch of rows
+    BATCH = 100
+    total = 0
+    batch = []
+
+    def flush():
+        nonlocal total
+        vecs = embed_texts([text for text, _ in batch])
+        upsert_points([
+            {
+                "id": str(uuid.uuid4()),
+                "vector": vec,
+                "payload": {"text": text, "source": source}
+            }
+            for (text, source), vec in zip(batch, vecs)
+        ])
+        total += len(batch)
+        batch.clear()
+
     with open(DATA_FILE, "r", encoding="utf-8", newline="") as f:
         reader = csv.DictReader(f)
         for row in reader:
@@ -19,19 +37,13 @@ def main():
             source = (row.get("source") or "").strip()
             if not text:
                 continue
-            vec = embed_text(text)
-            points.append({
-                "id": str(uuid.uuid4()),
-                "vector": vec,
-                "payload": {"text": text, "source": source}
-            })
-
-    # batch upserts to avoid large payloads
-    BATCH = 100
-    for i in range(0, len(points), BATCH):
-        upsert_points(points[i:i+BATCH])
+            batch.append((text, source))
+            if len(batch) >= BATCH:
+                flush()
+    if batch:
+        flush()
 
-    print(f"Ingested hashtags: {len(points)}")
+    print(f"Ingested hashtags: {total}")
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,11 @@
 # ingest_to_qdrant.py
-import csv, os, uuid
+import csv, os, re, uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
-from openai_integration import embed_text
-from qdrant_rest import ensure_collection, upsert_points
+from openai_integration import embed_texts
+from qdrant_rest import ensure_collection, get_indexing_threshold, set_indexing_threshold, upsert_points
 
 load_dotenv()
 DATA_DIR = Path(__file__).with_name("data")
@@ -18,6 +20,8 @@ FILES = [
 ]
 
 BATCH = 64
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "4"))  # concurrent embedding requests
+MAX_IN_FLIGHT = 8  # embedded batches waiting to be upserted
 
 def _rows_from_csv(path: Path, platform: str):
     if not path.exists():
@@ -38,45 +42,72 @@ def _rows_from_csv(path: Path, platform: str):
                 "platform": platform,
             }
 
+_WS_RE = re.compile(r"\s+")
+
 def _chunk(text: str, size=1000, overlap=150):
-    text = " ".join(text.split())
+    # one C-level pass instead of split() building a list of every word
+    text = _WS_RE.sub(" ", text).strip()
     i = 0
     while i < len(text):
         yield text[i:i+size]
         i += size - overlap
 
+def _embed_batch(buf):
+    """Embed a buffer of (piece, base_meta) in one request and build the points."""
+    vecs = embed_texts([piece for piece, _ in buf])
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "vector": vec,
+            "payload": {**meta, "text": piece},
+        }
+        for (piece, meta), vec in zip(buf, vecs)
+    ]
+
 def main():
     ensure_collection()
     pending = []
     total = 0
+    # embedding requests run on the pool while this thread upserts finished
+    # batches, so the OpenAI and Qdrant round-trips overlap
+    in_flight = deque()
 
-    for fname, platform in FILES:
-        path = DATA_DIR / fname
-        for row in _rows_from_csv(path, platform):
-            base_meta = {
-                "title": row["title"],
-                "source": row["source"],
-                "platform": platform,
-            }
-            # chunk each row so retrieval has smaller, relevant snippets
-            for piece in _chunk(row["text"], size=1100, overlap=150):
-                vec = embed_text(piece)
-                point = {
-                    "id": str(uuid.uuid4()),
-                    "vector": vec,
-                    "payload": {**base_meta, "text": piece},
-                }
-                pending.append(point)
-                if len(pending) >= BATCH:
-                    upsert_points(pending)
-                    total += len(pending)
-                    print(f"[ingest] upserted: {total}")
-                    pending = []
+    def drain(limit: int):
+        nonlocal total
+        while len(in_flight) > limit:
+            points = in_flight.popleft().result()
+            upsert_points(points)
+            total += len(points)
+            print(f"[ingest] upserted: {total}")
+
+    # pause HNSW indexing while batches stream in so Qdrant builds the index
+    # once at the end instead of re-optimizing segments after every upsert;
+    # the configured threshold is put back afterwards
+    restore_threshold = get_indexing_threshold()
+    set_indexing_threshold(0)
+    try:
+        with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as ex:
+            for fname, platform in FILES:
+                path = DATA_DIR / fname
+                for row in _rows_from_csv(path, platform):
+                    base_meta = {
+                        "title": row["title"],
+                        "source": row["source"],
+                        "platform": platform,
+                    }
+                    # chunk each row so retrieval has smaller, relevant snippets
+                    for piece in _chunk(row["text"], size=1100, overlap=150):
+                        pending.append((piece, base_meta))
+                        if len(pending) >= BATCH:
+                            in_flight.append(ex.submit(_embed_batch, pending))
+                            pending = []
+                            drain(MAX_IN_FLIGHT)
 
-    if pending:
-        upsert_points(pending)
-        total += len(pending)
-        print(f"[ingest] upserted: {total}")
+            if pending:
+                in_flight.append(ex.submit(_embed_batch, pending))
+            drain(0)
+    finally:
+        set_indexing_threshold(restore_threshold)
 
     print("Done.")
 
@@ -1,11 +1,27 @@
 import os
 import time
 import random
+import sqlite3
+import hashlib
+from array import array
+from contextlib import closing
+from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+try:
+    import orjson  # float-heavy embedding responses decode several times faster
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    import json
+    _loads = json.loads
+    _dumps = json.dumps
+
 # ---------------------------------------------------------------------
 # Env & constants
 # ---------------------------------------------------------------------
@@ -21,11 +37,33 @@ WEB_MODEL = os.getenv("WEB_MODEL", "gpt-4o-mini")  # chat completions
 CHAT_FALLBACK_MODEL = os.getenv("CHAT_FALLBACK_MODEL", WEB_MODEL)
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")  # 1536 dims
 
+# on-disk memo for embed_texts (the ingest path): re-runs only pay for rows
+# whose text changed. Set EMBED_CACHE_PATH="" to disable.
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", str(Path(__file__).with_name("data") / ".embed_cache.sqlite"))
+
 _DEFAULT_HEADERS = {
     "Authorization": f"Bearer {OPENAI_API_KEY}",
     "Content-Type": "application/json",
 }
 
+# one pooled session: keep-alive connections skip the TLS handshake on
+# every embedding/chat call. The adapter only re-sends after a dropped
+# connection; throttling/5xx retries are in _post_with_retry
+_SESSION = requests.Session()
+_SESSION.headers.update(_DEFAULT_HEADERS)
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=1,
+        read=0,  # a timed-out generation is not retried: it would double the wait
+        allowed_methods=frozenset({"POST"}),  # embeddings/chat are safe to replay
+    ),
+))
+
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+_RETRY_BACKOFF = 1.5  # seconds
+
 # ---------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------
@@ -37,25 +75,18 @@ def _env_bool(name: str, default: bool = False) -> bool:
         return False
     return default
 
-def _headers():
-    return _DEFAULT_HEADERS
-
-# ✅ tighter retries & timeouts to avoid gunicorn 502s
-def _post_with_retry(url: str, json_payload: dict, timeout: int = 25, max_retries: int = 2):
-    backoff = 1.5
-    last = None
-    for i in range(max_retries):
-        r = requests.post(url, headers=_headers(), json=json_payload, timeout=timeout)
-        if r.status_code in (429, 500, 502, 503, 504):
-            last = r
-            if i < max_retries - 1:
-                time.sleep(backoff ** (i + 1))
-                continue
-        r.raise_for_status()
-        return r
-    if last is not None:
-        last.raise_for_status()
-    raise RuntimeError("Request failed after retries")
+# ✅ a single retry after a fixed 1.5s on throttling/5xx keeps us inside
+# gunicorn's timeout. The sleep is explicit: urllib3 2.x doesn't back off
+# before a first retry, and an uncapped Retry-After could outlast the worker
+def _post_with_retry(url: str, json_payload: dict, timeout: int = 25):
+    # Content-Type: application/json comes from the session headers
+    body = _dumps(json_payload)
+    r = _SESSION.post(url, data=body, timeout=timeout)
+    if r.status_code in _RETRY_STATUSES:
+        time.sleep(_RETRY_BACKOFF)
+        r = _SESSION.post(url, data=body, timeout=timeout)
+    r.raise_for_status()
+    return r
 
 # ---------------------------------------------------------------------
 # Embeddings (REST)
@@ -65,7 +96,57 @@ def embed_text(text: str):
     url = f"{BASE_URL}/embeddings"
     payload = {"model": EMBED_MODEL, "input": text}
     r = _post_with_retry(url, payload, timeout=20)
-    return r.json()["data"][0]["embedding"]
+    return _loads(r.content)["data"][0]["embedding"]
+
+def _embed_texts_api(texts: List[str]) -> List[List[float]]:
+    url = f"{BASE_URL}/embeddings"
+    payload = {"model": EMBED_MODEL, "input": texts}
+    r = _post_with_retry(url, payload, timeout=60)
+    data = sorted(_loads(r.content)["data"], key=lambda d: d["index"])
+    return [d["embedding"] for d in data]
+
+def _embed_key(text: str) -> bytes:
+    # the model is part of the key: vectors from different models don't mix
+    return hashlib.blake2b(f"{EMBED_MODEL}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+def _embed_cache() -> sqlite3.Connection:
+    # one short-lived connection per call, so ingest worker threads never share one
+    Path(EMBED_CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(EMBED_CACHE_PATH, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vec BLOB NOT NULL)")
+    return conn
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embed many texts in one request; vectors come back in input order.
+
+    Vectors are memoized on disk by content hash (float32), so only texts not
+    seen before are sent to the API.
+    """
+    if not texts:
+        return []
+    if not EMBED_CACHE_PATH:
+        return _embed_texts_api(texts)
+    keys = [_embed_key(t) for t in texts]
+    with closing(_embed_cache()) as conn:
+        found: Dict[bytes, List[float]] = {}
+        uniq = list(dict.fromkeys(keys))
+        for i in range(0, len(uniq), 500):  # stay under SQLite's bound-parameter limit
+            part = uniq[i:i + 500]
+            rows = conn.execute(
+                f"SELECT key, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+            )
+            for k, blob in rows:
+                found[k] = array("f", blob).tolist()
+        missing = {k: t for k, t in zip(keys, texts) if k not in found}
+        if missing:
+            vecs = _embed_texts_api(list(missing.values()))
+            found.update(zip(missing.keys(), vecs))
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vec) VALUES (?, ?)",
+                    [(k, array("f", v).tobytes()) for k, v in zip(missing.keys(), vecs)],
+                )
+    return [found[k] for k in keys]
 
 # ---------------------------------------------------------------------
 # Chat core (REST)
@@ -83,7 +164,7 @@ def _chat_complete(
         "messages": messages,
     }
     r = _post_with_retry(url, payload, timeout=timeout)
-    data = r.json()
+    data = _loads(r.content)
     return (data["choices"][0]["message"]["content"] or "").strip()
 
 # ---------------------------------------------------------------------
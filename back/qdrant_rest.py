@@ -1,14 +1,49 @@
 # qdrant_rest.py
 import os, json, uuid, requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 from pathlib import Path
 
+try:
+    import orjson  # serializes big float vectors far faster than json.dumps
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+except ImportError:
+    def _dumps(obj) -> str:
+        return json.dumps(obj)
+
 ENV_PATH = Path(__file__).with_name(".env")
 load_dotenv(dotenv_path=ENV_PATH)
 
 QDRANT_URL = os.getenv("QDRANT_URL", "").rstrip("/")
 COLLECTION = os.getenv("QDRANT_COLLECTION", "company_knowledge")
 VECTOR_SIZE = int(os.getenv("QDRANT_VECTOR_SIZE", "1536"))
+# fallback for restoring indexing after a bulk ingest when the collection
+# reports no threshold of its own (see get_indexing_threshold)
+INDEXING_THRESHOLD = int(os.getenv("QDRANT_INDEXING_THRESHOLD", "20000"))
+# int8 scalar quantization for new collections: quantized vectors stay in RAM,
+# full-precision originals go to disk. Set to "none" for plain float32.
+QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "int8").strip().lower()
+
+# one pooled session for every Qdrant call: keep-alive connections avoid a
+# TLS handshake per search/upsert. All calls here are idempotent (search is
+# a read, upserts carry explicit ids), so POST is retried too.
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=50,
+    pool_maxsize=50,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"GET", "PUT", "POST", "PATCH", "DELETE"}),
+        raise_on_status=False,
+    ),
+)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)  # local Qdrant
 
 def _headers():
     key = os.getenv("QDRANT_API_KEY", "")
@@ -19,15 +54,37 @@ def _headers():
 def ensure_collection():
     if not QDRANT_URL or not COLLECTION:
         raise RuntimeError("QDRANT_URL or QDRANT_COLLECTION not set")
-    r = requests.get(f"{QDRANT_URL}/collections/{COLLECTION}", headers=_headers(), timeout=20)
+    r = _session.get(f"{QDRANT_URL}/collections/{COLLECTION}", headers=_headers(), timeout=20)
     if r.status_code == 200:
         return True
     payload = {"vectors": {"size": VECTOR_SIZE, "distance": "Cosine"}}
-    r = requests.put(f"{QDRANT_URL}/collections/{COLLECTION}",
+    if QUANTIZATION == "int8":
+        payload["vectors"]["on_disk"] = True
+        payload["quantization_config"] = {"scalar": {"type": "int8", "always_ram": True}}
+    r = _session.put(f"{QDRANT_URL}/collections/{COLLECTION}",
                      headers=_headers(), data=json.dumps(payload), timeout=30)
     r.raise_for_status()
     return True
 
+def get_indexing_threshold() -> int:
+    """
+    The collection's current HNSW indexing threshold, to restore after a bulk
+    load. Falls back to INDEXING_THRESHOLD when the collection reports none,
+    or reports 0 (indexing left paused by an interrupted ingest).
+    """
+    r = _session.get(f"{QDRANT_URL}/collections/{COLLECTION}", headers=_headers(), timeout=20)
+    r.raise_for_status()
+    cfg = r.json().get("result", {}).get("config", {}).get("optimizer_config", {})
+    return cfg.get("indexing_threshold") or INDEXING_THRESHOLD
+
+def set_indexing_threshold(threshold: int):
+    """Set the collection's HNSW indexing threshold (KB); 0 pauses indexing during bulk loads."""
+    body = {"optimizers_config": {"indexing_threshold": int(threshold)}}
+    r = _session.patch(f"{QDRANT_URL}/collections/{COLLECTION}",
+                       headers=_headers(), data=json.dumps(body), timeout=30)
+    r.raise_for_status()
+    return True
+
 def _valid_uuid(s: str) -> bool:
     try:
         uuid.UUID(str(s))
@@ -60,8 +117,8 @@ def upsert_points(points):
         })
 
     body = {"points": clean}
-    r = requests.put(f"{QDRANT_URL}/collections/{COLLECTION}/points",
-                     headers=_headers(), data=json.dumps(body), timeout=60)
+    r = _session.put(f"{QDRANT_URL}/collections/{COLLECTION}/points",
+                     headers=_headers(), data=_dumps(body), timeout=60)
     if r.status_code >= 400:
         print("[qdrant] UPSERT ERROR:", r.text)
     r.raise_for_status()
@@ -71,7 +128,7 @@ def search(vector, top_k=5):
     if not isinstance(vector, (list, tuple)):
         raise ValueError("vector must be list/tuple of floats")
     body = {"vector": vector, "limit": int(top_k), "with_payload": True}
-    r = requests.post(f"{QDRANT_URL}/collections/{COLLECTION}/points/search",
+    r = _session.post(f"{QDRANT_URL}/collections/{COLLECTION}/points/search",
                       headers=_headers(), data=json.dumps(body), timeout=30)
     if r.status_code == 403:
         print("[qdrant] SEARCH FORBIDDEN. Check QDRANT_API_KEY and cluster URL in back/.env")
@@ -79,10 +136,10 @@ def search(vector, top_k=5):
     return r.json().get("result", [])
 
 def show_collection():
-    r = requests.get(f"{QDRANT_URL}/collections/{COLLECTION}", headers=_headers(), timeout=20)
+    r = _session.get(f"{QDRANT_URL}/collections/{COLLECTION}", headers=_headers(), timeout=20)
     if r.status_code == 200:
         return r.json()
     return None
 
 def drop_collection():
-    requests.delete(f"{QDRANT_URL}/collections/{COLLECTION}", headers=_headers(), timeout=20)
+    _session.delete(f"{QDRANT_URL}/collections/{COLLECTION}", headers=_headers(), timeout=20)
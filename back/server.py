@@ -1,64 +1,139 @@
 import os
+
+# Under gunicorn's gevent worker (see Procfile) patch the stdlib before
+# requests/ssl are imported, so outbound HTTP yields instead of blocking.
+if os.getenv("GEVENT_PATCH", "").strip().lower() in ("1", "true", "yes", "on"):
+    from gevent import monkey
+    monkey.patch_all()
+
 import re
 import csv
-from datetime import datetime, timedelta
+import time
+import heapq
+import hashlib
+import logging
+import threading
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
-from typing import Optional, List
+from typing import Any, Dict, List, NamedTuple, Optional
 
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
+try:
+    import orjson  # fast JSON for every jsonify()/get_json() via the provider below
+except ImportError:
+    orjson = None
+
+try:
+    import tiktoken  # optional: token-accurate context budget; char cap alone otherwise
+except ImportError:
+    tiktoken = None
+
+try:
+    import numpy as np  # ships with qdrant-client; only the semantic answer cache needs it
+except ImportError:
+    np = None
+
 # Load .env (back/.env)
 ENV_PATH = Path(__file__).with_name(".env")
 load_dotenv(dotenv_path=ENV_PATH)
 
 # --- Safe startup logs (never print secrets) ---
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="[%(name)s] %(message)s")
+log = logging.getLogger("boot")
+
 wm = os.getenv("WEB_MODEL")
 wad = os.getenv("WEB_ALLOWED_DOMAINS")
 qdrant_url = os.getenv("QDRANT_URL")
 qdrant_key = (os.getenv("QDRANT_API_KEY") or "").strip()
 
-print(f"[boot] WEB_MODEL set to {wm if wm else '(default)'}")
-print("[boot] WEB_ALLOWED_DOMAINS configured" if wad else "[boot] WEB_ALLOWED_DOMAINS not set")
-print("[boot] QDRANT_URL configured" if qdrant_url else "[boot] QDRANT_URL not set")
-print(f"[boot] QDRANT_API_KEY loaded (length {len(qdrant_key)})" if qdrant_key else "[boot] QDRANT_API_KEY missing")
-print("[boot] OpenAI API key loaded" if (os.getenv("OPENAI_API_KEY") or "").strip() else "[boot] OpenAI API key MISSING")
+log.info("WEB_MODEL set to %s", wm if wm else "(default)")
+log.info("WEB_ALLOWED_DOMAINS configured" if wad else "WEB_ALLOWED_DOMAINS not set")
+log.info("QDRANT_URL configured" if qdrant_url else "QDRANT_URL not set")
+if qdrant_key:
+    log.info("QDRANT_API_KEY loaded (length %d)", len(qdrant_key))
+else:
+    log.info("QDRANT_API_KEY missing")
+log.info("OpenAI API key loaded" if (os.getenv("OPENAI_API_KEY") or "").strip() else "OpenAI API key MISSING")
+
+# ---- OpenAI / Qdrant clients (imported on first use) ----
+# both read env at import time; deferring them keeps /status and /diag/*
+# independent of the RAG stack (a missing OPENAI_API_KEY fails /ask, not boot)
+@lru_cache(maxsize=1)
+def _openai_mod():
+    import openai_integration
+    return openai_integration
+
+@lru_cache(maxsize=1)
+def _qdrant_mod():
+    import qdrant_rest
+    return qdrant_rest
+
+def embed_text(text: str):
+    return _openai_mod().embed_text(text)
 
-# Imports that use env
-from openai_integration import embed_text, chat_answer, web_answer_updated
-from qdrant_rest import search
+def chat_answer(context: str, question: str, temperature: float = 0.2) -> str:
+    return _openai_mod().chat_answer(context, question, temperature=temperature)
+
+def web_answer_updated(question: str, allowed_domains=None):
+    return _openai_mod().web_answer_updated(question, allowed_domains=allowed_domains)
+
+def search(vector, top_k=5):
+    return _qdrant_mod().search(vector, top_k=top_k)
 
 # ---- Gmail (read-only helper) ----
 # expects gmail_client.py with quick_summary(limit:int, q:str) -> str
 try:
     from gmail_client import quick_summary as gmail_quick_summary  # type: ignore
     _gmail_loaded = True
-    print("[boot] Gmail client loaded")
+    log.info("Gmail client loaded")
 except Exception as _e:
     _gmail_loaded = False
     def gmail_quick_summary(*args, **kwargs):  # type: ignore
         raise RuntimeError("Gmail client not available")
-    print(f"[boot] Gmail client NOT loaded ({type(_e).__name__})")
+    log.info("Gmail client NOT loaded (%s)", type(_e).__name__)
 
-# ---- Asana integration (optional) ----
-try:
-    from asana_integration import (
-        asana_available,
-        asana_answer,
-        refresh_asana_cache,
-        list_workspaces,
-        list_projects,
-    )
-    print("[boot] Asana integration loaded")
-except Exception as _e:
-    # Safe fallbacks if the module isn't present/valid
-    asana_available = lambda: False                          # type: ignore
-    asana_answer = lambda q: "Asana integration disabled"    # type: ignore
-    refresh_asana_cache = lambda force=True: []              # type: ignore
-    list_workspaces = lambda: []                             # type: ignore
-    list_projects = lambda ws=None: []                       # type: ignore
-    print(f"[boot] Asana integration NOT loaded ({type(_e).__name__})")
+# ---- Asana integration (optional, imported on first use) ----
+@lru_cache(maxsize=1)
+def _asana_mod():
+    try:
+        import asana_integration
+        log.info("Asana integration loaded")
+        return asana_integration
+    except Exception as e:
+        log.info("Asana integration NOT loaded (%s)", type(e).__name__)
+        return None
+
+def asana_available() -> bool:
+    # no PAT → no import at all (same check the module itself makes)
+    if not (os.getenv("ASANA_PAT") or "").strip():
+        return False
+    mod = _asana_mod()
+    return bool(mod and mod.asana_available())
+
+def asana_answer(q: str) -> str:
+    mod = _asana_mod()
+    return mod.asana_answer(q) if mod else "Asana integration disabled"
+
+def refresh_asana_cache(force: bool = True):
+    mod = _asana_mod()
+    return mod.refresh_asana_cache(force=force) if mod else []
+
+def list_workspaces():
+    mod = _asana_mod()
+    return mod.list_workspaces() if mod else []
+
+def list_projects(ws=None):
+    mod = _asana_mod()
+    return mod.list_projects(ws) if mod else []
 
 # ---------------------------
 # Config & helpers
@@ -79,8 +154,27 @@ ASANA_WORKSPACE_ID = (os.getenv("ASANA_WORKSPACE_ID") or "").strip()
 ENABLE_GA = _env_bool("ENABLE_GA", True)
 ENABLE_WEB_SEARCH = _env_bool("ENABLE_WEB_SEARCH", True)
 ENABLE_GMAIL = _env_bool("ENABLE_GMAIL", True) and _gmail_loaded  # only true if client import succeeded
+WARM_CACHES = _env_bool("WARM_CACHES", True)  # parse GA/hashtag CSVs in the background on first request
+
+class _OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; anything orjson can't encode goes through Flask's default hook."""
+    _OPTS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._OPTS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self._OPTS), mimetype=self.mimetype
+        )
 
 app = Flask(__name__)
+if orjson is not None:
+    app.json = _OrjsonProvider(app)
 
 # CORS – allow your Netlify site and localhost
 CORS(
@@ -98,11 +192,194 @@ CORS(
 
 TOP_K = int(os.getenv("TOP_K", "24"))
 MAX_CONTEXT_CHARS = int(os.getenv("MAX_CONTEXT_CHARS", "24000"))
+CONTEXT_TOP_N = int(os.getenv("CONTEXT_TOP_N", "8"))  # best hits passed to the LLM
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "6000"))  # needs tiktoken; 0 = char cap only
+
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))  # 0 = disabled
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))  # seconds; answers from an old corpus age out
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2048"))  # 0 = disabled
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds
 
 DATA_DIR = Path(__file__).with_name("data")
 HASHTAGS_CSV = DATA_DIR / "instagram_hashtags.csv"
 GA_CSV = DATA_DIR / "ga_metrics.csv"
 
+# ---------------------------
+# Query embedding cache
+# ---------------------------
+# keyed on the lowercased, whitespace-collapsed question so trivial variants
+# share an entry, but the vector is always of the text as asked (the first
+# variant seen), so retrieval isn't changed by the normalization
+_embed_lock = threading.Lock()
+_embed_entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> vector tuple, LRU order
+_embed_inflight: Dict[str, Future] = {}
+_embed_hits = 0
+_embed_misses = 0
+
+def _normalize_question(q_lower: str) -> str:
+    return " ".join(q_lower.split())
+
+def _embed_question(q: str) -> tuple:
+    """Cached question embedding; concurrent misses for the same key share one call."""
+    global _embed_hits, _embed_misses
+    key = _normalize_question(q.lower())
+    with _embed_lock:
+        vec = _embed_entries.get(key)
+        if vec is not None:
+            _embed_hits += 1
+            _embed_entries.move_to_end(key)
+            return vec
+        # an LRU alone doesn't coalesce concurrent misses: identical questions
+        # arriving together (double-submits, retries) would each pay a round-trip
+        fut = _embed_inflight.get(key)
+        owner = fut is None
+        if owner:
+            _embed_misses += 1
+            fut = _embed_inflight[key] = Future()
+    if not owner:
+        return fut.result()
+    try:
+        # tuple so callers can't mutate the cached vector
+        vec = tuple(embed_text(q))
+        with _embed_lock:
+            _embed_entries[key] = vec
+            while len(_embed_entries) > EMBED_CACHE_SIZE:
+                _embed_entries.popitem(last=False)
+        fut.set_result(vec)
+        return vec
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with _embed_lock:
+            _embed_inflight.pop(key, None)
+
+# ---------------------------
+# Semantic answer cache (paraphrased RAG questions)
+# ---------------------------
+# entries: { id: (unit float32 vector, answer, expires_at) } in LRU order;
+# the stacked matrix is rebuilt lazily after inserts/evictions
+_sem_lock = threading.Lock()
+_sem_entries: "OrderedDict[int, tuple]" = OrderedDict()
+_sem_matrix = None
+_sem_ids: List[int] = []
+_sem_next_id = 0
+
+def _unit(vec):
+    v = np.asarray(vec, dtype=np.float32)
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+def _semantic_lookup(qvec) -> Optional[str]:
+    global _sem_matrix, _sem_ids
+    if np is None or SEMANTIC_CACHE_SIZE <= 0:
+        return None
+    q = _unit(qvec)
+    with _sem_lock:
+        if not _sem_entries:
+            return None
+        if _sem_matrix is None:
+            _sem_ids = list(_sem_entries.keys())
+            _sem_matrix = np.stack([_sem_entries[i][0] for i in _sem_ids])
+        scores = _sem_matrix @ q
+        best = int(scores.argmax())
+        if scores[best] < SEMANTIC_CACHE_THRESHOLD:
+            return None
+        key = _sem_ids[best]
+        if _sem_entries[key][2] < time.monotonic():
+            # expired: drop it so a fresh answer replaces it on this miss
+            del _sem_entries[key]
+            _sem_matrix = None
+            return None
+        _sem_entries.move_to_end(key)
+        return _sem_entries[key][1]
+
+def _semantic_store(qvec, answer: str):
+    global _sem_matrix, _sem_next_id
+    if np is None or SEMANTIC_CACHE_SIZE <= 0 or not answer:
+        return
+    v = _unit(qvec)
+    with _sem_lock:
+        _sem_entries[_sem_next_id] = (v, answer, time.monotonic() + SEMANTIC_CACHE_TTL)
+        _sem_next_id += 1
+        while len(_sem_entries) > SEMANTIC_CACHE_SIZE:
+            _sem_entries.popitem(last=False)
+        _sem_matrix = None
+
+# ---------------------------
+# Exact answer cache ((context, question) → answer, with TTL)
+# ---------------------------
+# catches repeats the semantic cache can't (numpy missing / cache disabled)
+# and bounds staleness: entries expire even if the corpus is re-ingested
+_ans_lock = threading.Lock()
+_ans_entries: "OrderedDict[bytes, tuple]" = OrderedDict()  # key -> (expires_at, answer)
+
+def _answer_key(context: str, question: str) -> bytes:
+    return hashlib.blake2b(context.encode("utf-8") + b"\0" + question.encode("utf-8"), digest_size=16).digest()
+
+def _answer_lookup(key: bytes) -> Optional[str]:
+    if ANSWER_CACHE_SIZE <= 0:
+        return None
+    with _ans_lock:
+        hit = _ans_entries.get(key)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            del _ans_entries[key]
+            return None
+        _ans_entries.move_to_end(key)
+        return hit[1]
+
+def _answer_store(key: bytes, answer: str):
+    if ANSWER_CACHE_SIZE <= 0 or not answer:
+        return
+    with _ans_lock:
+        _ans_entries[key] = (time.monotonic() + ANSWER_CACHE_TTL, answer)
+        _ans_entries.move_to_end(key)
+        while len(_ans_entries) > ANSWER_CACHE_SIZE:
+            _ans_entries.popitem(last=False)
+
+def _clear_answer_caches() -> int:
+    """Drop every cached answer (semantic + exact); call after a re-ingest. Returns how many were dropped."""
+    global _sem_matrix
+    with _sem_lock:
+        n = len(_sem_entries)
+        _sem_entries.clear()
+        _sem_matrix = None
+    with _ans_lock:
+        n += len(_ans_entries)
+        _ans_entries.clear()
+    return n
+
+# ---------------------------
+# Intent routing (one keyword scan per question)
+# ---------------------------
+# substring keywords per /ask route; "ga"/"analytics" must be whole words
+_ROUTE_KEYWORDS = {
+    "web": ["news", "breaking", "today", "latest", "headline", "update"],
+    "asana": ["asana", "task", "ticket", "project"],
+    "ga": ["google analytics", "top countries", "top pages", "busiest",
+           "total active users", "daily active users", "daily users"],
+    "hashtag": ["hashtag"],  # also matches "hashtags"
+    "gmail": ["gmail", "email", "inbox", "unread", "from:", "subject:",
+              "newer_than:", "older_than:"],  # "unread" covers "is:unread"
+}
+_ROUTE_WORDS = {"ga": "ga", "analytics": "ga"}
+_KW_ROUTE = {kw: route for route, kws in _ROUTE_KEYWORDS.items() for kw in kws}
+_KW_ROUTE.update(_ROUTE_WORDS)
+# zero-width lookahead so overlapping keywords are all seen in a single pass
+_ROUTE_RE = re.compile("(?=(" + "|".join(
+    [re.escape(k) for k in sorted(_KW_ROUTE.keys() - _ROUTE_WORDS.keys(), key=len, reverse=True)]
+    + [rf"\b{re.escape(w)}\b" for w in _ROUTE_WORDS]
+) + "))")
+
+@lru_cache(maxsize=1024)  # chat UIs resend the same few questions
+def _route_tags(q_lower: str) -> frozenset:
+    """Names of the routes whose keywords appear in the (lowercased) question."""
+    return frozenset(_KW_ROUTE[m.group(1)] for m in _ROUTE_RE.finditer(q_lower))
+
 # ---------------------------
 # Secret redaction in error messages
 # ---------------------------
@@ -111,9 +388,12 @@ _SECRET_PATTERNS = [
     re.compile(r"Bearer\s+[A-Za-z0-9\-_\.]{20,}"),
     re.compile(r"[A-Za-z0-9]{32,}"),
 ]
+# every pattern above needs a run of 20+ of these chars; one scan for that
+# rules all three out for ordinary messages like "KeyError: 'foo'"
+_SECRET_TRIGGER_RE = re.compile(r"[A-Za-z0-9\-_\.]{20}")
 
 def _sanitize_error_message(msg: str) -> str:
-    if not msg:
+    if not msg or not _SECRET_TRIGGER_RE.search(msg):
         return msg
     safe = msg
     for pat in _SECRET_PATTERNS:
@@ -125,18 +405,31 @@ def _sanitize_error_message(msg: str) -> str:
 # ---------------------------
 _URL_RE = re.compile(r"https?://[^\s)>\]]+", re.IGNORECASE)
 _MD_LINK_RE = re.compile(r"\[([^\]]+)\]\((https?://[^)]+)\)")
+_PAREN_DOMAIN_RE = re.compile(r"\([a-z0-9\.\-]+\.com\)", re.IGNORECASE)
 
 def _sanitize_answer_format(text: str, max_bullets: int = 5):
     if not text:
         return "", []
-    # remove [title](url) → keep title
-    text = _MD_LINK_RE.sub(lambda m: m.group(1).strip(), text)
-    # remove raw URLs
-    text = _URL_RE.sub("", text)
-    # remove parenthetical domains like (example.com)
-    text = re.sub(r"\([a-z0-9\.\-]+\.com\)", "", text, flags=re.IGNORECASE)
-
-    lines = [ln.rstrip() for ln in text.splitlines()]
+    # single plain line (no links/URLs/parentheses, heading or bullet): every
+    # step below would reduce to strip(), so skip the regex passes
+    if (
+        "://" not in text
+        and "(" not in text
+        and not text.lstrip().startswith(("#", "-"))
+        and len(text.splitlines()) == 1
+    ):
+        return text.strip(), []
+    # each pass below needs a literal the answer usually lacks; a substring
+    # check is far cheaper than letting the regex scan for nothing
+    if "://" in text:
+        # remove [title](url) → keep title
+        text = _MD_LINK_RE.sub(lambda m: m.group(1).strip(), text)
+        # remove raw URLs
+        text = _URL_RE.sub("", text)
+    if "(" in text:
+        # remove parenthetical domains like (example.com)
+        text = _PAREN_DOMAIN_RE.sub("", text)
+
     out_lines = []
     bullet_buffer = []
 
@@ -151,58 +444,123 @@ def _sanitize_answer_format(text: str, max_bullets: int = 5):
             out_lines.append("")
             bullet_buffer = []
 
-    for ln in lines:
-        if ln.startswith("###") or ln.startswith("## "):
+    for ln in text.splitlines():
+        st = ln.strip()
+        if not st:
+            continue
+        # dispatch on the first character; only the matching branch scans further
+        first = st[0]
+        if first == "#" and ln.startswith(("###", "## ")):
             flush_bullets()
             if out_lines and out_lines[-1] != "":
                 out_lines.append("")
             heading = ln.lstrip("# ").strip()
             out_lines.append(f"**{heading}**")
             out_lines.append("")
-        elif re.match(r"^\s*-\s+", ln):
-            bullet_buffer.append(re.sub(r"^\s*-\s+", "• ", ln.strip()))
-        elif ln.strip():
+        elif first == "-" and len(st) > 1 and st[1].isspace():
+            # "- item" → "• item" without going through the regex engine
+            bullet_buffer.append("• " + st[1:].lstrip())
+        else:
             flush_bullets()
             if out_lines and out_lines[-1] != "":
                 out_lines.append("")
-            out_lines.append(ln.strip())
+            out_lines.append(st)
 
     flush_bullets()
-    clean_text = re.sub(r"\n{3,}", "\n\n", "\n".join(out_lines)).strip()
+    # every "" above is only appended after a non-blank entry, so the join
+    # can't contain a blank run to collapse
+    clean_text = "\n".join(out_lines).strip()
     return clean_text, []
 
+# ---------------------------
+# Parsed CSV cache (mtime-invalidated)
+# ---------------------------
+_csv_cache_lock = threading.Lock()
+_csv_cache: dict = {}  # { Path: (st_mtime_ns, rows) }
+
+def _cached_csv(path: Path, parse):
+    """Return parse()'s rows for `path`, re-parsing only when the file changes on disk."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return []
+    # size too: a same-second rewrite on a coarse-mtime filesystem still misses
+    key = (st.st_mtime_ns, st.st_size)
+    with _csv_cache_lock:
+        hit = _csv_cache.get(path)
+        if hit is not None and hit[0] == key:
+            return hit[1]
+        rows = parse()
+        _csv_cache[path] = (key, rows)
+        return rows
+
+# Gmail query cleanup (/ask Gmail path)
+_GMAIL_FILLER_RE = re.compile(r"\b(gmail|email|inbox)\b", re.IGNORECASE)
+_GMAIL_UNREAD_RE = re.compile(r"\bis:unread\b", re.IGNORECASE)
+
 # ---------------------------
 # Instagram Hashtags (CSV)
 # ---------------------------
+_KEYWORD_SPLIT_RE = re.compile(r"[^a-z0-9]+")
+
+class _HashtagRows(list):
+    """Hashtag rows, most frequent first; `rendered` memoizes _hashtag_lines per n for this load."""
+    rendered: Dict[int, str]
+
 def _load_hashtags_rows():
+    return _cached_csv(HASHTAGS_CSV, _parse_hashtags_rows)
+
+def _hashtag_lines(rows: _HashtagRows, n: int) -> str:
+    """'• #tag — freq' lines for the n most frequent tags."""
+    hit = rows.rendered.get(n)
+    if hit is None:
+        hit = rows.rendered[n] = "\n".join(f"• #{r['hashtag']} — {r['freq']}" for r in rows[:n])
+    return hit
+
+def _parse_hashtags_rows():
     rows = []
     if not HASHTAGS_CSV.exists():
         return rows
     with HASHTAGS_CSV.open("r", encoding="utf-8", newline="") as f:
-        rdr = csv.DictReader(f)
+        rdr = csv.reader(f)
+        header = next(rdr, None)
+        if not header:
+            return rows
+        # candidate columns in preference order, resolved once per file
+        tag_cols = [header.index(c) for c in ("hashtag", "tag") if c in header]
+        freq_cols = [header.index(c) for c in ("freq", "count", "frequency") if c in header]
+
+        def first(row, cols):
+            for i in cols:
+                if i < len(row) and row[i]:
+                    return row[i]
+            return ""
+
         for raw in rdr:
-            tag = (raw.get("hashtag") or raw.get("tag") or "").strip()
+            tag = first(raw, tag_cols).strip()
             if not tag:
                 continue
             if tag.startswith("#"):
                 tag = tag[1:]
-            freq = raw.get("freq") or raw.get("count") or raw.get("frequency") or ""
+            freq = first(raw, freq_cols)
             try:
-                freq_val = int(str(freq).replace(",", "").strip() or "0")
+                freq_val = int(freq.replace(",", "").strip() or "0")
             except Exception:
                 freq_val = 0
             rows.append({"hashtag": tag, "freq": freq_val})
+    # most frequent first, once per load; stable, so ties keep file order
+    rows.sort(key=lambda r: r["freq"], reverse=True)
+    rows = _HashtagRows(rows)
+    rows.rendered = {}
     return rows
 
 def _hashtags_top(n: int = 10) -> str:
     rows = _load_hashtags_rows()
     if not rows:
         return "I don’t have an Instagram hashtags CSV on this server yet."
-    top = sorted(rows, key=lambda r: r["freq"], reverse=True)[: max(1, n)]
-    lines = [f"**Top {len(top)} hashtags**"]
-    for r in top:
-        lines.append(f"• #{r['hashtag']} — {r['freq']}")
-    return "\n".join(lines)
+    n = max(1, n)
+    # rows are sorted by freq at load
+    return f"**Top {min(n, len(rows))} hashtags**\n" + _hashtag_lines(rows, n)
 
 def _hashtags_trending() -> str:
     return _hashtags_top(10)
@@ -217,7 +575,7 @@ def _hashtags_suggest(query: str, limit: int = 12) -> str:
         if sep in q:
             topic = q.split(sep, 1)[1]
             break
-    kws = [w for w in re.split(r"[^a-z0-9]+", topic) if w]
+    kws = [w for w in _KEYWORD_SPLIT_RE.split(topic) if w]
     if not kws:
         return _hashtags_top(limit)
     scored = []
@@ -228,8 +586,9 @@ def _hashtags_suggest(query: str, limit: int = 12) -> str:
             scored.append((score, r))
     if not scored:
         return _hashtags_top(limit)
-    scored.sort(key=lambda x: (x[0], x[1]["freq"]), reverse=True)
-    picked = [r for _, r in scored[:limit]]
+    # rows are already freq-ordered, so ranking on score alone keeps the
+    # (score, freq) order; nlargest is O(n log limit) instead of a full sort
+    picked = [r for _, r in heapq.nlargest(limit, scored, key=itemgetter(0))]
     lines = [f"**Suggested hashtags (topic: {topic})**"]
     for r in picked:
         lines.append(f"• #{r['hashtag']} — {r['freq']}")
@@ -239,12 +598,33 @@ def _hashtags_any() -> str:
     rows = _load_hashtags_rows()
     if not rows:
         return "I don’t have an Instagram hashtags CSV on this server yet."
-    rows = sorted(rows, key=lambda r: r["freq"], reverse=True)[:50]
-    return "\n".join([f"• #{r['hashtag']} — {r['freq']}" for r in rows])
+    return _hashtag_lines(rows, 50)
 
 # ---------------------------
 # GA fallback (CSV)
 # ---------------------------
+# one parsed GA CSV row: {"date": date|None, "country": str|None, "page": str|None, "users": int, "events": int}
+GARow = Dict[str, Any]
+
+class _GARows(list):
+    """Date-sorted GA rows plus columns precomputed once per load.
+
+    `dates` is the parallel sort-key column (date.min for undated rows);
+    `pos` is each row's position in the CSV file;
+    `days`, `day_users` and `day_events` are per-day totals over dated rows, in date order;
+    `windows` memoizes _ga_window_totals per window length for this load.
+    """
+    dates: List[date] = []
+    pos: List[int] = []
+    days: List[date] = []
+    day_users: List[int] = []
+    day_events: List[int] = []
+    windows: Dict[int, "_GAWindow"]
+
+class _GAWindow(NamedTuple):
+    by_country: Counter
+    by_page: Counter
+
 def _parse_int(val, default=0):
     try:
         if val is None:
@@ -256,69 +636,112 @@ def _parse_int(val, default=0):
     except Exception:
         return default
 
-def _find_col(row: dict, names: List[str]) -> str:
-    lower_map = {k.lower(): k for k in row.keys()}
+def _find_col(fieldnames: List[str], names: List[str]) -> int:
+    """Index of the first header matching one of `names` (case-insensitive), or -1."""
+    lower_map = {k.lower(): i for i, k in enumerate(fieldnames)}
     for n in names:
-        key = lower_map.get(n.lower())
-        if key:
-            return key
-    return ""
+        idx = lower_map.get(n.lower())
+        if idx is not None:
+            return idx
+    return -1
+
+@lru_cache(maxsize=4096)
+def _parse_ga_date(ds: str) -> Optional[date]:
+    # GA exports repeat each date across every country/page row, so the
+    # strptime/fromisoformat (and its exception path) runs once per distinct value.
+    # YYYYMMDD is sliced by hand: strptime's format machinery is the slow part
+    if len(ds) == 8 and ds.isdigit():
+        try:
+            return date(int(ds[:4]), int(ds[4:6]), int(ds[6:]))
+        except Exception:
+            return None
+    try:
+        return datetime.fromisoformat(ds).date()
+    except Exception:
+        return None
 
-def _load_ga_rows():
-    out = []
+def _load_ga_rows() -> List[GARow]:
+    return _cached_csv(GA_CSV, _parse_ga_rows)
+
+def _parse_ga_rows() -> List[GARow]:
+    out: List[GARow] = []
     if not GA_CSV.exists():
         return out
     with GA_CSV.open("r", encoding="utf-8", newline="") as f:
-        rdr = csv.DictReader(f)
-        if not rdr.fieldnames:
+        rdr = csv.reader(f)
+        header = next(rdr, None)
+        if not header:
             return out
-        for raw in rdr:
-            if not raw:
+        # resolve columns once per file, then index plain row lists
+        date_i    = _find_col(header, ["date", "Date"])
+        country_i = _find_col(header, ["country", "Country"])
+        page_i    = _find_col(header, ["pagePath", "page", "page_title", "Page path and screen class", "pagePathPlusQuery"])
+        users_i   = _find_col(header, ["activeUsers", "users", "Users"])
+        events_i  = _find_col(header, ["eventCount", "Events"])
+        for row in rdr:
+            if not row:
                 continue
-            date_col    = _find_col(raw, ["date", "Date"])
-            country_col = _find_col(raw, ["country", "Country"])
-            page_col    = _find_col(raw, ["pagePath", "page", "page_title", "Page path and screen class", "pagePathPlusQuery"])
-            users_col   = _find_col(raw, ["activeUsers", "users", "Users"])
-            events_col  = _find_col(raw, ["eventCount", "Events"])
+            n = len(row)
 
             dt_val = None
-            if date_col:
-                ds = (raw.get(date_col) or "").strip()
-                if len(ds) == 8 and ds.isdigit():
-                    try:
-                        dt_val = datetime.strptime(ds, "%Y%m%d").date()
-                    except Exception:
-                        dt_val = None
-                else:
-                    try:
-                        dt_val = datetime.fromisoformat(ds).date()
-                    except Exception:
-                        dt_val = None
-
-            country = (raw.get(country_col) or "").strip() if country_col else None
-            page    = (raw.get(page_col) or "").strip() if page_col else None
-            users   = _parse_int(raw.get(users_col), 0) if users_col else 0
-            events  = _parse_int(raw.get(events_col), 0) if events_col else 0
+            if date_i >= 0:
+                dt_val = _parse_ga_date(row[date_i].strip() if date_i < n else "")
+
+            country = row[country_i].strip() if 0 <= country_i < n else None
+            page    = row[page_i].strip() if 0 <= page_i < n else None
+            # GA exports plain digit strings: int() them directly and keep
+            # _parse_int for the odd "1,234" / "12.0" / blank cell
+            users_s  = row[users_i] if 0 <= users_i < n else ""
+            events_s = row[events_i] if 0 <= events_i < n else ""
+            users   = int(users_s) if users_s.isdecimal() else _parse_int(users_s, 0)
+            events  = int(events_s) if events_s.isdecimal() else _parse_int(events_s, 0)
 
             out.append({"date": dt_val, "country": country or None, "page": page or None, "users": users, "events": events})
-    return out
+    # sorted once per file load (undated rows first) so window queries are a
+    # binary search plus a tail slice instead of a rescan of every row;
+    # `pos` keeps each row's file position for file-order tie-breaking
+    pos = sorted(range(len(out)), key=lambda i: out[i]["date"] or date.min)
+    out = [out[i] for i in pos]
+    rows = _GARows(out)
+    rows.pos = pos
+    rows.dates = [r["date"] or date.min for r in out]
+    # per-day totals, so summary/daily answers cost O(days in window) per request
+    rows.days, rows.day_users, rows.day_events = [], [], []
+    rows.windows = {}
+    for r in out:
+        d = r["date"]
+        if d is None:
+            continue
+        if rows.days and rows.days[-1] == d:
+            rows.day_users[-1] += r["users"]
+            rows.day_events[-1] += r["events"]
+        else:
+            rows.days.append(d)
+            rows.day_users.append(r["users"])
+            rows.day_events.append(r["events"])
+    return rows
 
-def _ga_in_window(rows, days: int):
-    valid = [r for r in rows if r["date"] is not None]
-    if not valid:
+def _ga_in_window(rows: List[GARow], days: int) -> List[GARow]:
+    # rows are date-sorted (see _parse_ga_rows): latest is the last row and
+    # the window is the tail starting at the first date >= start
+    if not rows or rows[-1]["date"] is None:
         return []
-    latest = max(r["date"] for r in valid)
+    latest = rows[-1]["date"]
     start = latest - timedelta(days=days - 1)
-    return [r for r in valid if start <= r["date"] <= latest]
-
-def _ga_summary(rows, days: int):
-    w = _ga_in_window(rows, days)
-    total_users = sum(r["users"] for r in w)
-    total_events = sum(r["events"] for r in w)
-    by_day = {}
-    for r in w:
-        by_day[r["date"]] = by_day.get(r["date"], 0) + r["users"]
-    day_lines = [f"• {d.isoformat()}: {by_day[d]} users" for d in sorted(by_day.keys())]
+    return rows[bisect_left(rows.dates, start):]
+
+def _ga_first_day(rows: _GARows, days: int) -> int:
+    """Index into rows.days of the first day inside the `days`-day window."""
+    if not rows.days:
+        return 0
+    start = rows.days[-1] - timedelta(days=days - 1)
+    return bisect_left(rows.days, start)
+
+def _ga_summary(rows: _GARows, days: int) -> str:
+    i = _ga_first_day(rows, days)
+    total_users = sum(rows.day_users[i:])
+    total_events = sum(rows.day_events[i:])
+    day_lines = [f"• {d.isoformat()}: {n} users" for d, n in zip(rows.days[i:], rows.day_users[i:])]
     return (
         f"**Google Analytics — last {days} days**\n\n"
         f"• Total active users: **{total_users}**\n"
@@ -326,12 +749,24 @@ def _ga_summary(rows, days: int):
         f"**Daily users**\n" + ("\n".join(day_lines) if day_lines else "• (no daily rows)")
     )
 
-def _ga_top_countries(rows, days: int, limit: int = 5):
-    w = _ga_in_window(rows, days)
-    agg = {}
-    for r in w:
-        agg[r["country"] or "(unknown)"] = agg.get(r["country"] or "(unknown)", 0) + r["users"]
-    top = sorted(agg.items(), key=lambda x: x[1], reverse=True)[:limit]
+def _ga_window_totals(rows: _GARows, days: int) -> _GAWindow:
+    """Users per country and per page over the window: one pass, memoized per load."""
+    hit = rows.windows.get(days)
+    if hit is None:
+        by_country: Counter = Counter()
+        by_page: Counter = Counter()
+        # walk the window in file order: most_common breaks count ties by
+        # first insertion, and that has to be first appearance in the CSV
+        lo = len(rows) - len(_ga_in_window(rows, days))
+        for i in sorted(range(lo, len(rows)), key=rows.pos.__getitem__):
+            r = rows[i]
+            by_country[r["country"] or "(unknown)"] += r["users"]
+            by_page[r["page"] or "(unknown)"] += r["users"]
+        hit = rows.windows[days] = _GAWindow(by_country, by_page)
+    return hit
+
+def _ga_top_countries(rows: _GARows, days: int, limit: int = 5) -> str:
+    top = _ga_window_totals(rows, days).by_country.most_common(limit)  # heap-based top-K
     if not top:
         return "I don’t have GA country data in the dataset."
     lines = ["**Top countries by users**"]
@@ -339,12 +774,8 @@ def _ga_top_countries(rows, days: int, limit: int = 5):
         lines.append(f"• {c}: {n}")
     return "\n".join(lines)
 
-def _ga_top_pages(rows, days: int, limit: int = 5):
-    w = _ga_in_window(rows, days)
-    agg = {}
-    for r in w:
-        agg[r["page"] or "(unknown)"] = agg.get(r["page"] or "(unknown)", 0) + r["users"]
-    top = sorted(agg.items(), key=lambda x: x[1], reverse=True)[:limit]
+def _ga_top_pages(rows: _GARows, days: int, limit: int = 5) -> str:
+    top = _ga_window_totals(rows, days).by_page.most_common(limit)  # heap-based top-K
     if not top:
         return "I don’t have GA page data in the dataset."
     lines = ["**Top pages by users**"]
@@ -352,32 +783,22 @@ def _ga_top_pages(rows, days: int, limit: int = 5):
         lines.append(f"• {p}: {n}")
     return "\n".join(lines)
 
-def _ga_daily_users(rows, days: int):
-    w = _ga_in_window(rows, days)
-    by_day = {}
-    for r in w:
-        by_day[r["date"]] = by_day.get(r["date"], 0) + r["users"]
+def _ga_daily_users(rows: _GARows, days: int) -> str:
+    i = _ga_first_day(rows, days)
     lines = ["**Daily active users**"]
-    for d in sorted(by_day.keys()):
-        lines.append(f"• {d.isoformat()}: {by_day[d]}")
+    for d, n in zip(rows.days[i:], rows.day_users[i:]):
+        lines.append(f"• {d.isoformat()}: {n}")
     if len(lines) == 1:
         return "I don’t have GA daily user data."
     return "\n".join(lines)
 
 # ✅ STRICT GA trigger — NEVER hijack non-GA queries
-def _maybe_answer_ga(q_lower: str) -> Optional[str]:
+def _maybe_answer_ga(q_lower: str, tags: frozenset) -> Optional[str]:
     if not ENABLE_GA:
         return None
     # Only consider GA *if* user clearly asked about GA/Analytics
-    ga_mention = (
-        re.search(r"\bga\b", q_lower) is not None
-        or "google analytics" in q_lower
-        or re.search(r"\banalytics\b", q_lower) is not None
-    )
-    if not ga_mention and not any(kw in q_lower for kw in [
-        "top countries", "top pages", "busiest",
-        "total active users", "daily active users", "daily users"
-    ]):
+    # (or used one of the GA metric phrases, see _ROUTE_KEYWORDS)
+    if "ga" not in tags:
         return None
 
     # If the CSV isn't present, DO NOT hijack other routes
@@ -397,6 +818,62 @@ def _maybe_answer_ga(q_lower: str) -> Optional[str]:
         return _ga_daily_users(rows, days)
     return _ga_summary(rows, days)
 
+# ---------------------------
+# RAG context
+# ---------------------------
+def _join_truncated(texts, sep: str, cap: int) -> str:
+    """sep.join(non-empty texts)[:cap], but stops consuming texts once cap is reached."""
+    parts = []
+    total = 0
+    for t in texts:
+        if not t:
+            continue
+        if parts:
+            parts.append(sep)
+            total += len(sep)
+        parts.append(t)
+        total += len(t)
+        if total >= cap:
+            break
+    return "".join(parts)[:cap]
+
+@lru_cache(maxsize=1)
+def _context_encoding():
+    if tiktoken is None or MAX_CONTEXT_TOKENS <= 0:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # encoding file not cached and no network
+        return None
+
+@lru_cache(maxsize=4096)
+def _chunk_tokens(text: str) -> tuple:
+    # the same chunks come back for related questions; encode each once
+    return tuple(_context_encoding().encode(text))
+
+def _token_budget(texts, sep: str, budget: int):
+    """Yield texts until `budget` tokens (separators included) are used; the last one is cut to fit."""
+    enc = _context_encoding()
+    if enc is None:
+        yield from texts
+        return
+    sep_len = len(enc.encode(sep))
+    used = 0
+    for t in texts:
+        if not t:
+            continue
+        if used:
+            used += sep_len
+        toks = _chunk_tokens(t)
+        room = budget - used
+        if room <= 0:
+            return
+        if len(toks) > room:
+            yield enc.decode(list(toks[:room]))
+            return
+        used += len(toks)
+        yield t
+
 # ---------------------------
 # Routes
 # ---------------------------
@@ -428,6 +905,8 @@ def home():
               <li><code>GET /asana/workspaces</code> — if ASANA_PAT is set</li>
               <li><code>GET /asana/projects?workspace=&lt;gid&gt;</code> — or set <code>ASANA_WORKSPACE_ID</code></li>
               <li><code>POST /asana/refresh</code> — refresh Asana cache</li>
+              <li><code>GET /cache/stats</code> — query embedding cache hit rate</li>
+              <li><code>POST /cache/clear</code> — drop cached answers (run after a re-ingest)</li>
             </ul>
           </body>
         </html>
@@ -458,6 +937,36 @@ def asana_refresh():
     projs = refresh_asana_cache(force=True)
     return jsonify({"ok": True, "projects": projs})
 
+@app.get("/cache/stats")
+def cache_stats():
+    lookups = _embed_hits + _embed_misses
+    return jsonify({
+        "embeddings": {
+            "hits": _embed_hits,
+            "misses": _embed_misses,
+            "size": len(_embed_entries),
+            "maxsize": EMBED_CACHE_SIZE,
+            "hit_rate": round(_embed_hits / lookups, 3) if lookups else 0.0,
+        },
+        "semantic": {
+            "enabled": np is not None and SEMANTIC_CACHE_SIZE > 0,
+            "size": len(_sem_entries),
+            "maxsize": SEMANTIC_CACHE_SIZE,
+            "threshold": SEMANTIC_CACHE_THRESHOLD,
+            "ttl": SEMANTIC_CACHE_TTL,
+        },
+        "answers": {
+            "enabled": ANSWER_CACHE_SIZE > 0,
+            "size": len(_ans_entries),
+            "maxsize": ANSWER_CACHE_SIZE,
+            "ttl": ANSWER_CACHE_TTL,
+        },
+    })
+
+@app.post("/cache/clear")
+def cache_clear():
+    return jsonify({"ok": True, "cleared": _clear_answer_caches()})
+
 @app.get("/diag/ga")
 def diag_ga():
     return jsonify({
@@ -489,6 +998,8 @@ def diag_gmail():
     except Exception as e:
         return jsonify({"ok": False, "error": _sanitize_error_message(str(e))})
 
+ask_log = logging.getLogger("/ask")  # per-request route trace; LOG_LEVEL=WARNING silences it
+
 @app.post("/ask")
 def ask():
     try:
@@ -498,12 +1009,13 @@ def ask():
             return jsonify({"error": "Missing question"}), 400
 
         q_lower = q.lower()
+        tags = _route_tags(q_lower)
 
         # 0) WEB first (explicit mode or “newsy” keywords) so GA can't preempt
         web_mode = str(data.get("mode") or "").lower() == "web"
-        newsy = any(k in q_lower for k in ["news", "breaking", "today", "latest", "headline", "update"])
+        newsy = "web" in tags
         if ENABLE_WEB_SEARCH and (web_mode or newsy):
-            print("[/ask] path=WEB")
+            ask_log.info("path=WEB")
             allowed = None
             wad_env = os.getenv("WEB_ALLOWED_DOMAINS")
             if wad_env:
@@ -518,21 +1030,21 @@ def ask():
                 return jsonify({"error": _sanitize_error_message(str(e)), "answer": "", "sources": []}), 502
 
         # 1) Asana questions first (if PAT available)
-        if asana_available() and any(k in q_lower for k in ["asana", "task", "ticket", "project", "tasks"]):
-            print("[/ask] path=ASANA")
+        if "asana" in tags and asana_available():
+            ask_log.info("path=ASANA")
             ans = asana_answer(q)
             clean_text, _ = _sanitize_answer_format(ans)
             return jsonify({"answer": clean_text, "sources": []})
 
         # 2) GA (strict trigger, feature-flagged)
-        ga_try = _maybe_answer_ga(q_lower)
+        ga_try = _maybe_answer_ga(q_lower, tags)
         if ga_try is not None:
-            print("[/ask] path=GA")
+            ask_log.info("path=GA")
             return jsonify({"answer": ga_try, "sources": []})
 
         # 3) Instagram Hashtags (CSV)
-        if "hashtag" in q_lower or q_lower.startswith("#") or "hashtags" in q_lower:
-            print("[/ask] path=HASHTAGS")
+        if "hashtag" in tags or q_lower.startswith("#"):
+            ask_log.info("path=HASHTAGS")
             if "top" in q_lower:
                 return jsonify({"answer": _hashtags_top(), "sources": []})
             if "trending" in q_lower:
@@ -542,16 +1054,16 @@ def ask():
             return jsonify({"answer": _hashtags_any(), "sources": []})
 
         # 3.5) Gmail (read-only), simple intents
-        if ENABLE_GMAIL and any(k in q_lower for k in ["gmail", "email", "inbox", "unread", "from:", "subject:", "is:unread", "newer_than:", "older_than:"]):
-            print("[/ask] path=GMAIL")
+        if ENABLE_GMAIL and "gmail" in tags:
+            ask_log.info("path=GMAIL")
 
             # Build a clean Gmail query string
             q_raw = (data.get("question") or "").strip()
             # Remove filler tokens that break Gmail search
-            q_clean = re.sub(r"\b(gmail|email|inbox)\b", "", q_raw, flags=re.I).strip()
+            q_clean = _GMAIL_FILLER_RE.sub("", q_raw).strip()
 
             gmail_filter_parts = []
-            if "unread" in q_lower and not re.search(r"\bis:unread\b", q_clean, flags=re.I):
+            if "unread" in q_lower and not _GMAIL_UNREAD_RE.search(q_clean):
                 gmail_filter_parts.append("is:unread")
 
             # If user already provided Gmail operators, prefer their string
@@ -575,20 +1087,33 @@ def ask():
                 return jsonify({"answer": "", "error": _sanitize_error_message(str(e)), "sources": []}), 502
 
         # 4) RAG search in Qdrant
-        print("[/ask] path=RAG")
-        qvec = embed_text(q)
+        ask_log.info("path=RAG")
+        qvec = list(_embed_question(q))
+        cached = _semantic_lookup(qvec)
+        if cached is not None:
+            return jsonify({"answer": cached, "sources": []})
         try:
-            hits = search(qvec, top_k=TOP_K)
+            # Qdrant returns hits best-first by cosine score against qvec, so
+            # only the head is ever used; don't fetch payloads for the long tail
+            # (distractor chunks and prompt tokens stay out of the context)
+            hits = search(qvec, top_k=min(TOP_K, CONTEXT_TOP_N))
         except Exception:
             hits = []
-        chunks = [h.get("payload", {}).get("text", "") for h in hits if h.get("payload")]
-        context = "\n\n---\n\n".join([c for c in chunks if c])[:MAX_CONTEXT_CHARS]
+        chunks = (h.get("payload", {}).get("text", "") for h in hits if h.get("payload"))
+        # token budget first (when tiktoken is available), char cap as the backstop
+        chunks = _token_budget(chunks, "\n\n---\n\n", MAX_CONTEXT_TOKENS)
+        context = _join_truncated(chunks, "\n\n---\n\n", MAX_CONTEXT_CHARS)
 
         # 5) Grounded answer using context
         if context.strip():
             try:
-                raw_ans = (chat_answer(context, q, temperature=0.2) or "").strip()
-                clean_text, _ = _sanitize_answer_format(raw_ans)
+                ans_key = _answer_key(context, q)
+                clean_text = _answer_lookup(ans_key)
+                if clean_text is None:
+                    raw_ans = (chat_answer(context, q, temperature=0.2) or "").strip()
+                    clean_text, _ = _sanitize_answer_format(raw_ans)
+                    _answer_store(ans_key, clean_text)
+                _semantic_store(qvec, clean_text)
                 return jsonify({"answer": clean_text, "sources": []})
             except Exception as e:
                 return jsonify({"error": _sanitize_error_message(str(e)), "answer": "", "sources": []}), 502
@@ -600,5 +1125,38 @@ def ask():
         # Return a generic, sanitized error to the client
         return jsonify({"error": f"{type(e).__name__}: {safe_msg}", "answer": "", "sources": []}), 500
 
+# ---------------------------
+# Cache warmup
+# ---------------------------
+def _warm_caches():
+    """Parse the GA and hashtag CSVs at startup so the first GA/hashtag question doesn't pay for it."""
+    try:
+        if ENABLE_GA:
+            _load_ga_rows()
+        _load_hashtags_rows()
+    except Exception as e:
+        log.warning("cache warmup failed (%s)", type(e).__name__)
+
+# started by the first request each process serves, not at import: under
+# `gunicorn --preload` that is after the fork, so no worker inherits a held
+# _csv_cache_lock, and plain `import server` starts nothing. The request
+# itself doesn't wait; one arriving mid-parse blocks on the lock instead of
+# parsing the file a second time
+_warm_started = False
+_warm_start_lock = threading.Lock()
+
+@app.before_request
+def _start_cache_warmup():
+    global _warm_started
+    if _warm_started or not WARM_CACHES:
+        return
+    with _warm_start_lock:
+        if _warm_started:
+            return
+        _warm_started = True
+    threading.Thread(target=_warm_caches, name="warm-caches", daemon=True).start()
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=PORT, debug=True)
+    # local runs only; production is gunicorn (see Procfile). threaded so
+    # concurrent /ask calls overlap their OpenAI/Qdrant waits, debug opt-in
+    app.run(host="0.0.0.0", port=PORT, debug=_env_bool("FLASK_DEBUG", False), threaded=True)